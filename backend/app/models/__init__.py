@@ -1,10 +1,12 @@
 from .base import Base, BaseModel
+from .crawl_job import CrawlJob
 from .property import Property, School
 from .suburb import Suburb
 
 __all__ = [
     "Base",
     "BaseModel",
+    "CrawlJob",
     "Property",
     "School",
     "Suburb",
@@ -0,0 +1,32 @@
+from datetime import datetime
+from sqlalchemy import DateTime, Integer, String, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from .base import BaseModel
+
+
+class CrawlJob(BaseModel):
+    """A crawl shard (state x property type x price range) queued for scraper workers
+
+    Workers claim pending jobs, or running jobs whose lease expired, and keep the lease
+    alive with heartbeats while they crawl the shard.
+    """
+
+    shard_key: Mapped[str] = mapped_column(String, unique=True)
+    state: Mapped[str] = mapped_column(String)
+    property_type: Mapped[str] = mapped_column(String)
+    established_type: Mapped[str] = mapped_column(String)
+    low_price: Mapped[int] = mapped_column(Integer)
+    high_price: Mapped[int] = mapped_column(Integer)
+
+    # pending, running, done or failed
+    status: Mapped[str] = mapped_column(String, default="pending")
+    worker_id: Mapped[str] = mapped_column(String, nullable=True)
+    lease_expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+
+    listings: Mapped[int] = mapped_column(Integer, nullable=True)
+    error: Mapped[str] = mapped_column(String, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_crawljob_status_lease", "status", "lease_expires_at"),)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING, List, Dict
-from sqlalchemy import String, Float, Integer, ForeignKey, Table, Column
+from sqlalchemy import BigInteger, String, Float, Integer, ForeignKey, Table, Column
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from .base import BaseModel, Base
@@ -36,6 +36,9 @@ class Property(BaseModel):
     listing_method: Mapped[str] = mapped_column(String, nullable=True)
     listing_url: Mapped[str] = mapped_column(String, unique=True)
 
+    # Hash of the search card (price, status and key fields), changes when the listing does
+    fingerprint: Mapped[int] = mapped_column(BigInteger, nullable=True)
+
     # Specifications
     bedrooms: Mapped[int] = mapped_column(Integer)
     bathrooms: Mapped[int] = mapped_column(Integer)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING, List, Dict, Any
-from sqlalchemy import String, Float, Integer, ForeignKey
+from sqlalchemy import BigInteger, String, Float, Integer, ForeignKey
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import BaseModel
@@ -34,6 +34,9 @@ class Suburb(BaseModel):
     luxury_price: Mapped[float] = mapped_column(Float, nullable=True)
     sales_growth: Mapped[Mapped[List[Dict[str, Any]]]] = mapped_column(JSONB, default=list, nullable=True)
 
+    # Hash of the suburbInsights block the row was last written from, to detect changed payloads
+    insights_hash: Mapped[int] = mapped_column(BigInteger, nullable=True)
+
     # Relationships
     properties: Mapped[List[Property]] = relationship("Property", back_populates="suburb", lazy="selectin")
     schools: Mapped[List[School]] = relationship("School", back_populates="suburb_rel", lazy="selectin")
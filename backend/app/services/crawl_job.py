@@ -0,0 +1,119 @@
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.crawl_job import CrawlJob
+
+# Claims per job, including ones lost to an expired lease, before it is marked failed
+MAX_JOB_ATTEMPTS = 3
+
+
+class CrawlJobService:
+    """Queue of crawl shards shared by scraper workers on any number of machines
+
+    Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent claims never
+    block on or hand out the same row. A claimed job is leased: the worker renews the
+    lease with heartbeats, and once it lapses the job can be claimed again by another
+    worker. Every timestamp comes from the database clock, so workers' clocks don't matter.
+    """
+
+    def enqueue(self, db: Session, shards: List[Dict[str, Any]]) -> int:
+        """Add shards that aren't queued yet, returns how many were added"""
+
+        if not shards:
+            return 0
+
+        # Core insert, an ORM bulk insert has no rowcount, and only added shards come back
+        stmt = insert(CrawlJob.__table__).on_conflict_do_nothing(index_elements=["shard_key"])
+        added = db.execute(stmt.returning(CrawlJob.__table__.c.id), shards).all()
+        db.commit()
+        return len(added)
+
+    def claim(
+        self, db: Session, worker_id: str, lease_seconds: int, max_attempts: int = MAX_JOB_ATTEMPTS
+    ) -> Optional[CrawlJob]:
+        """Lease the next pending job, or one whose worker stopped heartbeating"""
+
+        expired = and_(CrawlJob.status == "running", CrawlJob.lease_expires_at < func.now())
+
+        # Jobs that lost their lease too many times are given up on rather than retried forever
+        db.execute(
+            update(CrawlJob)
+            .where(expired, CrawlJob.attempts >= max_attempts)
+            .values(status="failed", error="lease expired", worker_id=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+
+        job = (
+            db.query(CrawlJob)
+            .filter(CrawlJob.attempts < max_attempts, or_(CrawlJob.status == "pending", expired))
+            .order_by(CrawlJob.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.commit()
+            return None
+
+        job.status = "running"
+        job.worker_id = worker_id
+        job.attempts += 1
+        job.heartbeat_at = func.now()
+        job.lease_expires_at = func.now() + timedelta(seconds=lease_seconds)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    def heartbeat(self, db: Session, job_id: int, worker_id: str, lease_seconds: int) -> bool:
+        """Extend a job's lease, returns False if the worker no longer holds it"""
+
+        result = db.execute(
+            update(CrawlJob)
+            .where(CrawlJob.id == job_id, CrawlJob.worker_id == worker_id, CrawlJob.status == "running")
+            .values(heartbeat_at=func.now(), lease_expires_at=func.now() + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def finish(self, db: Session, job_id: int, worker_id: str, listings: int) -> bool:
+        """Mark a leased job done, returns False if the lease was lost in the meantime"""
+
+        result = db.execute(
+            update(CrawlJob)
+            .where(CrawlJob.id == job_id, CrawlJob.worker_id == worker_id, CrawlJob.status == "running")
+            .values(status="done", listings=listings, finished_at=func.now(), lease_expires_at=None, error=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def release(
+        self, db: Session, job_id: int, worker_id: str, error: str, max_attempts: int = MAX_JOB_ATTEMPTS
+    ) -> bool:
+        """Hand a job the worker couldn't finish back to the queue, or fail it once out of attempts"""
+
+        result = db.execute(
+            update(CrawlJob)
+            .where(CrawlJob.id == job_id, CrawlJob.worker_id == worker_id, CrawlJob.status == "running")
+            .values(
+                status=case((CrawlJob.attempts >= max_attempts, "failed"), else_="pending"),
+                error=error,
+                worker_id=None,
+                lease_expires_at=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def counts(self, db: Session) -> Dict[str, int]:
+        """Number of jobs in each status"""
+
+        rows = db.query(CrawlJob.status, func.count(CrawlJob.id)).group_by(CrawlJob.status).all()
+        db.commit()
+        return dict(rows)
+
+
+crawl_job_service = CrawlJobService()
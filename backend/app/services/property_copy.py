@@ -0,0 +1,340 @@
+import io
+import json
+import tempfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Set, Tuple
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from app.models.property import Property, School, property_school
+from app.models.suburb import Suburb
+from app.services.property_import import property_import_service
+
+# Staging tables are scratch space for one load at a time, emptied before and after each
+STAGING_PROPERTY = "staging_property"
+STAGING_SUBURB = "staging_suburb"
+STAGING_SCHOOL = "staging_school"
+STAGING_PROPERTY_SCHOOL = "staging_property_school"
+STAGING_WRITTEN = "staging_written"
+
+# Columns the transforms produce for each table, in COPY order (seq is the listing's position in the load)
+PROPERTY_COLUMNS = [column for column in property_import_service.property_row({}) if column != "suburb_id"]
+SUBURB_COLUMNS = ["name", "postcode", *property_import_service.transform_suburb_data({})]
+SCHOOL_COLUMNS = [column for column in property_import_service.school_row({"id": 0}, None) if column != "suburb_id"]
+# Staged schools carry the suburb of the listing that named them instead of its id
+STAGED_SCHOOL_COLUMNS = [*SCHOOL_COLUMNS, "suburb_name", "suburb_postcode"]
+LINK_COLUMNS = ["property_id", "school_id", "distance"]
+
+
+def copy_value(value: Any, column_type: Any) -> str:
+    """One field of a COPY text-format row"""
+
+    if value is None:
+        return "\\N"
+    if isinstance(column_type, postgresql.ARRAY):
+        elements = []
+        for element in value:
+            if element is None:
+                elements.append("NULL")
+            else:
+                elements.append('"' + str(element).replace("\\", "\\\\").replace('"', '\\"') + '"')
+        value = "{" + ",".join(elements) + "}"
+    elif isinstance(column_type, postgresql.JSONB):
+        value = json.dumps(value)
+    else:
+        value = str(value)
+
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class CopyRowWriter:
+    """Encodes rows of a staging table as COPY text format
+
+    Columns are typed like the target table's, extra staging columns are plain text.
+    """
+
+    def __init__(self, table, columns: List[str]):
+        types = {column.name: column.type for column in table.columns}
+        self.columns = columns
+        self._types = [None] + [types.get(column) for column in columns]
+
+    def encode(self, seq: int, row: Dict[str, Any]) -> bytes:
+        values = [seq] + [row.get(column) for column in self.columns]
+        fields = [copy_value(value, column_type) for value, column_type in zip(values, self._types)]
+        return ("\t".join(fields) + "\n").encode()
+
+
+class IteratorReader(io.RawIOBase):
+    """File-like view of an iterator of byte chunks, for streaming into COPY FROM STDIN"""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class PropertyCopyLoader:
+    """Bulk loads listings into Postgres through unlogged staging tables and COPY
+
+    Meant for initial loads and full rebuilds. Listings are transformed with the import
+    service's transforms and streamed into the staging tables with COPY FROM STDIN in a
+    single pass, so memory use does not grow with the load. Suburbs, properties, schools
+    and school links are then merged with set-based SQL. The whole load commits as one
+    transaction.
+
+    The merge follows the per-row import's rules. New listings are inserted. Known
+    listings are only updated when their card fingerprint changed. A listing that
+    appears more than once is taken from its last occurrence. Listings whose suburb
+    has no insights, or whose url belongs to another listing, are left out.
+    """
+
+    def __init__(self):
+        self.property_rows = CopyRowWriter(Property.__table__, PROPERTY_COLUMNS)
+        self.suburb_rows = CopyRowWriter(Suburb.__table__, SUBURB_COLUMNS)
+        self.school_rows = CopyRowWriter(School.__table__, STAGED_SCHOOL_COLUMNS)
+        self.link_rows = CopyRowWriter(property_school, LINK_COLUMNS)
+
+    def create_staging_tables(self, db: Session) -> None:
+        dialect = postgresql.dialect()
+        staging = [
+            (STAGING_PROPERTY, Property.__table__, PROPERTY_COLUMNS),
+            (STAGING_SUBURB, Suburb.__table__, SUBURB_COLUMNS),
+            (STAGING_SCHOOL, School.__table__, STAGED_SCHOOL_COLUMNS),
+            (STAGING_PROPERTY_SCHOOL, property_school, LINK_COLUMNS),
+        ]
+        for name, table, columns in staging:
+            column_types = {column.name: column.type.compile(dialect=dialect) for column in table.columns}
+            definitions = ", ".join(f"{column} {column_types.get(column, 'VARCHAR')}" for column in columns)
+            db.execute(text(f"CREATE UNLOGGED TABLE IF NOT EXISTS {name} (seq BIGINT, {definitions})"))
+
+        db.execute(text(f"CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_WRITTEN} (id INTEGER PRIMARY KEY, seq BIGINT)"))
+        self.truncate_staging_tables(db)
+
+    def truncate_staging_tables(self, db: Session) -> None:
+        tables = [STAGING_PROPERTY, STAGING_SUBURB, STAGING_SCHOOL, STAGING_PROPERTY_SCHOOL, STAGING_WRITTEN]
+        db.execute(text(f"TRUNCATE {', '.join(tables)}"))
+
+    def copy(self, db: Session, table: str, columns: List[str], source: BinaryIO) -> None:
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table} (seq, {', '.join(columns)}) FROM STDIN", source)
+        finally:
+            cursor.close()
+
+    def stage(self, db: Session, listings: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Stream listings into the staging tables in one pass, returning row counts
+
+        Properties go straight into COPY. Suburb, school and link rows are spooled to
+        temporary files alongside and copied once the listings run out.
+        """
+
+        counts = {"listings": 0, "suburbs": 0, "schools": 0, "links": 0}
+        seen_suburbs: Set[Tuple] = set()
+        seen_schools: Set[int] = set()
+
+        with (
+            tempfile.TemporaryFile() as suburbs,
+            tempfile.TemporaryFile() as schools,
+            tempfile.TemporaryFile() as links,
+        ):
+
+            def property_chunks() -> Iterator[bytes]:
+                for seq, property_data in enumerate(listings):
+                    if not property_data.get("listingId"):
+                        continue
+                    counts["listings"] += 1
+                    yield self.property_rows.encode(seq, property_import_service.property_row(property_data))
+
+                    # Each suburb payload only needs staging once
+                    suburb_key = (
+                        property_data.get("suburb"),
+                        property_data.get("postcode"),
+                        property_data.get("suburbInsightsHash"),
+                    )
+                    if property_data.get("suburbInsights") and suburb_key not in seen_suburbs:
+                        seen_suburbs.add(suburb_key)
+                        counts["suburbs"] += 1
+                        suburb = property_import_service.transform_suburb_data(property_data)
+                        suburb.update(name=property_data.get("suburb"), postcode=property_data.get("postcode"))
+                        suburbs.write(self.suburb_rows.encode(seq, suburb))
+
+                    for school_data in property_data.get("schools") or []:
+                        if not school_data.get("id"):
+                            continue
+
+                        school_id = int(school_data["id"])
+                        counts["links"] += 1
+                        link = {
+                            "property_id": property_data["listingId"],
+                            "school_id": school_id,
+                            "distance": school_data.get("distance"),
+                        }
+                        links.write(self.link_rows.encode(seq, link))
+
+                        if school_id not in seen_schools:
+                            seen_schools.add(school_id)
+                            counts["schools"] += 1
+                            school = property_import_service.school_row(school_data, None)
+                            school["suburb_name"] = property_data.get("suburb")
+                            school["suburb_postcode"] = property_data.get("postcode")
+                            schools.write(self.school_rows.encode(seq, school))
+
+            self.copy(db, STAGING_PROPERTY, PROPERTY_COLUMNS, IteratorReader(property_chunks()))
+            for table, columns, spooled in [
+                (STAGING_SUBURB, SUBURB_COLUMNS, suburbs),
+                (STAGING_SCHOOL, STAGED_SCHOOL_COLUMNS, schools),
+                (STAGING_PROPERTY_SCHOOL, LINK_COLUMNS, links),
+            ]:
+                spooled.seek(0)
+                self.copy(db, table, columns, spooled)
+
+        return counts
+
+    def merge(self, db: Session) -> Dict[str, int]:
+        """Merge the staging tables into suburb, property, school and property_school"""
+
+        suburb_columns = [column for column in SUBURB_COLUMNS if column not in ("name", "postcode")]
+        property_columns = [column for column in PROPERTY_COLUMNS if column != "id"]
+        school_columns = [column for column in SCHOOL_COLUMNS if column != "id"]
+
+        def columns(names: List[str], prefix: str = "") -> str:
+            return ", ".join(f"{prefix}{name}" for name in names)
+
+        # Fields missing from the new data keep their stored value, as with the per-row update
+        property_updates = ", ".join(
+            f"{column} = coalesce(excluded.{column}, property.{column})" for column in property_columns
+        )
+        suburb_updates = ", ".join(f"{column} = s.{column}" for column in suburb_columns)
+
+        # One payload per suburb, the most recently staged
+        latest_suburbs = f"""
+            SELECT DISTINCT ON (name, postcode) * FROM {STAGING_SUBURB} ORDER BY name, postcode, seq DESC
+        """
+        # Suburbs aren't unique on (name, postcode), the import always links the oldest
+        suburb_ids = "SELECT DISTINCT ON (name, postcode) id, name, postcode FROM suburb ORDER BY name, postcode, id"
+
+        created_suburbs = db.execute(
+            text(
+                f"""
+                INSERT INTO suburb (name, postcode, {columns(suburb_columns)}, created_at, updated_at)
+                SELECT s.name, s.postcode, {columns(suburb_columns, "s.")}, now(), now()
+                FROM ({latest_suburbs}) s
+                WHERE NOT EXISTS (SELECT 1 FROM suburb su WHERE su.name = s.name AND su.postcode = s.postcode)
+                ON CONFLICT (suburb_profile_url) DO NOTHING
+                """
+            )
+        ).rowcount
+
+        updated_suburbs = db.execute(
+            text(
+                f"""
+                UPDATE suburb su
+                SET {suburb_updates}, updated_at = now()
+                FROM ({latest_suburbs}) s
+                WHERE su.name = s.name AND su.postcode = s.postcode
+                  AND s.insights_hash IS NOT NULL AND s.insights_hash IS DISTINCT FROM su.insights_hash
+                """
+            )
+        ).rowcount
+
+        written_properties = db.execute(
+            text(
+                f"""
+                WITH latest AS (
+                    SELECT DISTINCT ON (id) * FROM {STAGING_PROPERTY} ORDER BY id, seq DESC
+                ), unique_urls AS (
+                    SELECT DISTINCT ON (coalesce(listing_url, id::text)) *
+                    FROM latest ORDER BY coalesce(listing_url, id::text), seq DESC
+                ), written AS (
+                    INSERT INTO property (id, suburb_id, {columns(property_columns)}, created_at, updated_at)
+                    SELECT p.id, s.id, {columns(property_columns, "p.")}, now(), now()
+                    FROM unique_urls p
+                    JOIN ({suburb_ids}) s ON s.name = p.suburb_name AND s.postcode = p.postcode
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM property o WHERE o.listing_url = p.listing_url AND o.id <> p.id
+                    )
+                    ON CONFLICT (id) DO UPDATE SET
+                        suburb_id = excluded.suburb_id,
+                        {property_updates},
+                        updated_at = excluded.updated_at
+                    WHERE excluded.fingerprint IS NOT NULL
+                      AND excluded.fingerprint IS DISTINCT FROM property.fingerprint
+                    RETURNING id
+                )
+                INSERT INTO {STAGING_WRITTEN} (id, seq)
+                SELECT w.id, p.seq FROM written w JOIN unique_urls p ON p.id = w.id
+                """
+            )
+        ).rowcount
+
+        # Schools are only created for written listings, with the suburb of the listing that first named them
+        created_schools = db.execute(
+            text(
+                f"""
+                INSERT INTO school (id, {columns(school_columns)}, suburb_id, created_at, updated_at)
+                SELECT sc.id, {columns(school_columns, "sc.")}, s.id, now(), now()
+                FROM {STAGING_SCHOOL} sc
+                LEFT JOIN ({suburb_ids}) s ON s.name = sc.suburb_name AND s.postcode = sc.suburb_postcode
+                WHERE EXISTS (
+                    SELECT 1 FROM {STAGING_PROPERTY_SCHOOL} l
+                    JOIN {STAGING_WRITTEN} w ON w.id = l.property_id AND w.seq = l.seq
+                    WHERE l.school_id = sc.id
+                )
+                ON CONFLICT (id) DO NOTHING
+                """
+            )
+        ).rowcount
+
+        # Written listings are relinked from scratch with the links of the occurrence that was kept
+        db.execute(text(f"DELETE FROM property_school ps USING {STAGING_WRITTEN} w WHERE ps.property_id = w.id"))
+        created_links = db.execute(
+            text(
+                f"""
+                INSERT INTO property_school (property_id, school_id, distance)
+                SELECT DISTINCT ON (l.property_id, l.school_id) l.property_id, l.school_id, l.distance
+                FROM {STAGING_PROPERTY_SCHOOL} l
+                JOIN {STAGING_WRITTEN} w ON w.id = l.property_id AND w.seq = l.seq
+                WHERE EXISTS (SELECT 1 FROM school WHERE school.id = l.school_id)
+                ORDER BY l.property_id, l.school_id, l.seq
+                ON CONFLICT DO NOTHING
+                """
+            )
+        ).rowcount
+
+        return {
+            "suburbs_created": created_suburbs,
+            "suburbs_updated": updated_suburbs,
+            "properties_written": written_properties,
+            "schools_created": created_schools,
+            "links_written": created_links,
+        }
+
+    def load(self, db: Session, listings: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Stage and merge a stream of listings in one transaction, returning row counts"""
+
+        try:
+            self.create_staging_tables(db)
+            stats = self.stage(db, listings)
+            stats.update(self.merge(db))
+            self.truncate_staging_tables(db)
+            db.commit()
+            return stats
+        except Exception:
+            db.rollback()
+            raise
+
+
+property_copy_loader = PropertyCopyLoader()
@@ -1,14 +1,21 @@
-from typing import Dict, Any, Optional
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Set
+from sqlalchemy import BigInteger, Integer, String, bindparam, func, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from app.models.property import Property, School, property_school
-from app.models.suburb import Suburb
 
 
 class PropertyImportService:
     def transform_property_data(self, property_data: Dict[str, Any]) -> Dict[str, Any]:
         """Transform raw JSON data to match our schema structure"""
 
+        return {k: v for k, v in self.property_row(property_data).items() if v is not None}
+
+    def property_row(self, property_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Every property column for the raw JSON data, with missing values as None"""
+
         listing_summary = property_data.get("listingSummary", {})
 
         transformed = {
@@ -22,6 +29,7 @@ class PropertyImportService:
             "listing_mode": listing_summary.get("mode"),
             "listing_method": listing_summary.get("method"),
             "listing_url": property_data.get("listingUrl"),
+            "fingerprint": property_data.get("cardFingerprint"),
             # Specifications
             "bedrooms": property_data.get("beds", 0),
             "bathrooms": property_data.get("baths", 0),
@@ -41,95 +49,133 @@ class PropertyImportService:
             "images": property_data.get("gallery", []),
         }
 
-        return {k: v for k, v in transformed.items() if v is not None}
-
-    def create_or_get_school(self, db: Session, school_data: Dict[str, Any]) -> Optional[School]:
-        school_id = school_data.get("id")
-        if not school_id:
-            return None
-
-        # Check if school exists in database
-        school_id = int(school_id)
-        existing_school = db.query(School).filter(School.id == school_id).first()
-        if existing_school:
-            return existing_school
-
-        school = School(
-            id=school_id,
-            name=school_data.get("name"),
-            education_level=school_data.get("educationLevel"),
-            year_range=school_data.get("year"),
-            type=school_data.get("type"),
-            gender=school_data.get("gender"),
-            state=school_data.get("state"),
-            postcode=school_data.get("postCode"),
-            suburb_id=school_data.get("suburb_id"),
-        )
-
-        try:
-            db.add(school)
-            db.flush()
-        except IntegrityError:
-            db.rollback()
-            return None
+        return transformed
 
-        return school
+    def transform_card_data(self, card: Dict[str, Any]) -> Dict[str, Any]:
+        """Transform a search result card to the bind parameters of a summary update"""
 
-    def create_or_get_suburb(self, db: Session, property_data: Dict[str, Any]) -> Optional[Suburb]:
-        """Create a suburb if it doesn't exist and return it"""
+        return {
+            "listing_id": card.get("listingId"),
+            "card_type": card.get("propertyType"),
+            "card_price": card.get("price"),
+            "card_beds": card.get("beds"),
+            "card_baths": card.get("baths"),
+            "card_parking": card.get("parking"),
+            "card_fingerprint": card.get("cardFingerprint"),
+        }
 
-        # Extract suburb data from property
-        suburb_name = property_data.get("suburb")
-        suburb_postcode = property_data.get("postcode")
-        if not suburb_name or not suburb_postcode:
-            raise ValueError("Missing required suburb information (name or postcode)")
+    def school_row(self, school_data: Dict[str, Any], suburb_id: Optional[int]) -> Dict[str, Any]:
+        """School columns from a listing's school catchment entry"""
 
-        suburb_insights = property_data.get("suburbInsights", {})
-        if not suburb_insights:
-            raise ValueError("No suburb information found in property data")
+        return {
+            "id": int(school_data["id"]),
+            "name": school_data.get("name"),
+            "education_level": school_data.get("educationLevel"),
+            "year_range": school_data.get("year"),
+            "type": school_data.get("type"),
+            "gender": school_data.get("gender"),
+            "state": school_data.get("state"),
+            "postcode": school_data.get("postCode"),
+            "suburb_id": suburb_id,
+        }
 
-        # Check if suburb exists in database
-        suburb = db.query(Suburb).filter_by(name=suburb_name, postcode=suburb_postcode).first()
-        if suburb:
-            return suburb
+    def transform_suburb_data(self, property_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Suburb columns from a listing's suburbInsights block"""
 
         suburb_insights = property_data.get("suburbInsights", {})
         demographics = suburb_insights.get("demographics", {})
 
-        # Create new suburb
-        suburb = Suburb(
-            name=suburb_name,
-            postcode=suburb_postcode,
-            state=property_data.get("state"),
-            suburb_profile_url=suburb_insights.get("suburbProfileUrl"),
+        return {
+            "state": property_data.get("state"),
+            "suburb_profile_url": suburb_insights.get("suburbProfileUrl"),
             # Demographics
-            population=demographics.get("population"),
-            avg_age_range=demographics.get("avgAge"),
-            owner_percentage=demographics.get("owners"),
-            renter_percentage=demographics.get("renters"),
-            family_percentage=demographics.get("families"),
-            single_percentage=demographics.get("singles"),
+            "population": demographics.get("population"),
+            "avg_age_range": demographics.get("avgAge"),
+            "owner_percentage": demographics.get("owners"),
+            "renter_percentage": demographics.get("renters"),
+            "family_percentage": demographics.get("families"),
+            "single_percentage": demographics.get("singles"),
             # Additional insights
-            median_price=suburb_insights.get("medianPrice"),
-            median_rent=suburb_insights.get("medianRentPrice"),
-            avg_days_on_market=suburb_insights.get("avgDaysOnMarket"),
-            entry_price=suburb_insights.get("entryLevelPrice"),
-            luxury_price=suburb_insights.get("luxuryLevelPrice"),
+            "median_price": suburb_insights.get("medianPrice"),
+            "median_rent": suburb_insights.get("medianRentPrice"),
+            "avg_days_on_market": suburb_insights.get("avgDaysOnMarket"),
+            "entry_price": suburb_insights.get("entryLevelPrice"),
+            "luxury_price": suburb_insights.get("luxuryLevelPrice"),
             # Sales growth data
-            sales_growth=suburb_insights.get("salesGrowthList", {}),
-        )
+            "sales_growth": suburb_insights.get("salesGrowthList", {}),
+            "insights_hash": property_data.get("suburbInsightsHash"),
+        }
 
-        try:
-            db.add(suburb)
-            db.flush()
-        except IntegrityError as e:
-            db.rollback()
-            return None
+    def resolve_schools(self, db: Session, properties: List[Dict[str, Any]]) -> Set[int]:
+        """Make sure every school the listings mention exists, returns their ids
+
+        The schools already stored are found with one IN query and the missing ones are
+        inserted in a single statement, each taking the suburb of the first listing that
+        mentions it. Every listing needs suburb_id.
+        """
+
+        schools: Dict[int, Dict[str, Any]] = {}
+        for property_data in properties:
+            for school_data in property_data.get("schools") or []:
+                if school_data.get("id") and int(school_data["id"]) not in schools:
+                    schools[int(school_data["id"])] = self.school_row(school_data, property_data["suburb_id"])
+
+        if not schools:
+            return set()
+
+        existing = set(db.scalars(select(School.id).where(School.id.in_(list(schools)))))
+        missing = [row for school_id, row in schools.items() if school_id not in existing]
+        if missing:
+            # Another importer may have added some of them since the lookup, its rows are kept
+            db.execute(insert(School.__table__).on_conflict_do_nothing(index_elements=["id"]), missing)
+        return set(schools)
+
+    def school_links(self, properties: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """property_school rows for the listings, one per property and school"""
+
+        links: Dict[tuple, Dict[str, Any]] = {}
+        for property_data in properties:
+            property_id = int(property_data["listingId"])
+            for school_data in property_data.get("schools") or []:
+                if not school_data.get("id"):
+                    continue
 
-        return suburb
+                school_id = int(school_data["id"])
+                links.setdefault(
+                    (property_id, school_id),
+                    {"property_id": property_id, "school_id": school_id, "distance": school_data.get("distance")},
+                )
+        return list(links.values())
+
+    def link_schools(self, db: Session, db_property: Property, property_data: Dict[str, Any]) -> None:
+        """Create the property's school catchment associations, creating any missing schools"""
+
+        self.resolve_schools(db, [property_data])
+        links = self.school_links([{**property_data, "listingId": db_property.id}])
+        if links:
+            db.execute(insert(property_school).on_conflict_do_nothing(), links)
+
+    def update_property_with_relations(
+        self, db: Session, db_property: Property, property_data: Dict[str, Any]
+    ) -> Property:
+        """Overwrite an existing property with freshly scraped data and relink its schools"""
+
+        for key, value in self.transform_property_data(property_data).items():
+            setattr(db_property, key, value)
+        db.flush()
+
+        db.execute(property_school.delete().where(property_school.c.property_id == db_property.id))
+        self.link_schools(db, db_property, property_data)
+        return db_property
 
     def create_property_with_relations(self, db: Session, property_data: Dict[str, Any]) -> Optional[Property]:
-        """Create a property with all its related data"""
+        """Create a property with all its related data
+
+        An existing property is updated in place when the data carries a card fingerprint
+        that differs from the stored one, and skipped otherwise. The listing is written in
+        a savepoint, so when it fails only its own rows are rolled back and the caller's
+        transaction stays usable for the rest of the batch.
+        """
 
         if not property_data.get("suburb_id"):
             raise ValueError("suburb_id is required")
@@ -137,48 +183,122 @@ class PropertyImportService:
         if not property_data.get("listingId"):
             raise ValueError("no listingId for property")
 
+        listing_id = property_data.get("listingId")
         try:
-            # Check if property already exists
-            listing_id = property_data.get("listingId")
-            existing_property = db.query(Property).filter(Property.id == listing_id).first()
-            if existing_property:
-                print(f"Property with ID {listing_id} already exists, skipping...")
-                return existing_property
+            # Everything this listing writes is undone on failure, without losing the rest of the import
+            with db.begin_nested():
+                # Check if property already exists
+                existing_property = db.query(Property).filter(Property.id == listing_id).first()
+                if existing_property:
+                    fingerprint = property_data.get("cardFingerprint")
+                    if fingerprint is not None and fingerprint != existing_property.fingerprint:
+                        return self.update_property_with_relations(db, existing_property, property_data)
 
-            # Transform the raw data
-            transformed_data = self.transform_property_data(property_data)
+                    print(f"Property with ID {listing_id} already exists, skipping...")
+                    return existing_property
 
-            # Create the main property
-            db_property = Property(**transformed_data)
-
-            try:
+                # Create the main property
+                db_property = Property(**self.transform_property_data(property_data))
                 db.add(db_property)
                 db.flush()
-            except IntegrityError as e:
-                db.rollback()
-                print(f"IntegrityError for property {transformed_data.get('property_id')}: {str(e)}")
-                return None
-
-            # Create schools
-            if "schools" in property_data:
-                for school_data in property_data["schools"]:
-                    school_data["suburb_id"] = property_data["suburb_id"]
-
-                    # Create or get school
-                    school = self.create_or_get_school(db, school_data)
-                    if school:
-                        # Create association with distance
-                        distance = school_data.get("distance")
-                        stmt = property_school.insert().values(
-                            property_id=db_property.id, school_id=school.id, distance=distance
-                        )
-                        db.execute(stmt)
-
-            return db_property
 
+                # Create schools
+                self.link_schools(db, db_property, property_data)
+
+                return db_property
+
+        except IntegrityError as e:
+            print(f"IntegrityError for property {listing_id}: {str(e)}")
+            return None
         except Exception as e:
-            db.rollback()
             raise Exception(f"Error creating property: {str(e)}")
 
+    def bulk_import_properties(self, db: Session, properties: List[Dict[str, Any]]) -> Set[int]:
+        """Write a chunk of properties, their schools and school links with set-based statements
+
+        Same result as create_property_with_relations on each listing in order: new
+        listings are inserted, known ones are only overwritten (and their school links
+        replaced) when their card fingerprint differs from the stored one, and a new
+        school takes the suburb of the first written listing that mentions it. Every
+        listing needs suburb_id and listingId, and the fields a new property can't do
+        without (listingUrl, features, structuredFeatures) even when it is already stored,
+        as Postgres checks them before it finds the conflict. Detail page listings always
+        carry them. Returns the ids of the properties written.
+        """
+
+        # A listing repeated in the chunk is applied once per round, in order, like the per-row path would
+        rounds: List[List[Dict[str, Any]]] = []
+        occurrences: Dict[int, int] = defaultdict(int)
+        for property_data in properties:
+            listing_id = int(property_data["listingId"])
+            if occurrences[listing_id] == len(rounds):
+                rounds.append([])
+            rounds[occurrences[listing_id]].append(property_data)
+            occurrences[listing_id] += 1
+
+        written: Set[int] = set()
+        for listings in rounds:
+            written.update(self._bulk_import_round(db, listings))
+        return written
+
+    def _bulk_import_round(self, db: Session, listings: List[Dict[str, Any]]) -> Set[int]:
+        table = Property.__table__
+        columns = [column for column in self.property_row({}) if column != "id"]
+        stmt = insert(table)
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            # Fields missing from the new data keep their stored value, as with the per-row update
+            set_={
+                **{column: func.coalesce(excluded[column], table.c[column]) for column in columns},
+                "updated_at": excluded.updated_at,
+            },
+            where=excluded.fingerprint.isnot(None) & excluded.fingerprint.is_distinct_from(table.c.fingerprint),
+        ).returning(table.c.id)
+
+        rows = [
+            {**self.property_row(property_data), "id": int(property_data["listingId"])} for property_data in listings
+        ]
+        written = {row.id for row in db.execute(stmt, rows)}
+        if not written:
+            return written
+
+        # Updated properties are relinked from scratch, inserted ones have no links yet
+        db.execute(property_school.delete().where(property_school.c.property_id.in_(written)))
+
+        written_listings = [property_data for property_data in listings if int(property_data["listingId"]) in written]
+        self.resolve_schools(db, written_listings)
+        links = self.school_links(written_listings)
+        if links:
+            db.execute(insert(property_school).on_conflict_do_nothing(), links)
+        return written
+
+    def update_property_summaries(self, db: Session, cards: List[Dict[str, Any]]) -> None:
+        """Refresh the price and specification columns of existing properties from search cards
+
+        Runs as a single executemany UPDATE. Listings without a property row are left for
+        the detail page import, and fields missing from a card keep their stored value. A
+        card carrying a cardFingerprint stores it too, so the database agrees with the seen
+        index about which listings are up to date.
+        """
+
+        if not cards:
+            return
+
+        table = Property.__table__
+        stmt = (
+            table.update()
+            .where(table.c.id == bindparam("listing_id"))
+            .values(
+                type=func.coalesce(bindparam("card_type", type_=String), table.c.type),
+                display_price=func.coalesce(bindparam("card_price", type_=String), table.c.display_price),
+                bedrooms=func.coalesce(bindparam("card_beds", type_=Integer), table.c.bedrooms),
+                bathrooms=func.coalesce(bindparam("card_baths", type_=Integer), table.c.bathrooms),
+                parking_spaces=func.coalesce(bindparam("card_parking", type_=Integer), table.c.parking_spaces),
+                fingerprint=func.coalesce(bindparam("card_fingerprint", type_=BigInteger), table.c.fingerprint),
+            )
+        )
+        db.execute(stmt, [self.transform_card_data(card) for card in cards])
+
 
 property_import_service = PropertyImportService()
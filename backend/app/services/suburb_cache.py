@@ -0,0 +1,172 @@
+import threading
+from datetime import datetime, UTC
+from typing import Any, Dict, Optional, Tuple
+from weakref import WeakKeyDictionary
+from sqlalchemy import event, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app.models.suburb import Suburb
+from app.services.property_import import property_import_service
+
+SuburbKey = Tuple[str, str]
+
+
+class SuburbCache:
+    """In-process map of (suburb name, postcode) to suburb id and insights hash for imports
+
+    Every known suburb is loaded in one query the first time the cache is used, so a
+    crawl's imports hardly ever look a suburb up. A miss takes a transaction-scoped
+    advisory lock on the suburb key before checking the table again and inserting, so
+    import workers in other processes never create the same suburb twice. A suburb whose
+    insights hash changed is refreshed in place.
+
+    Suburbs inserted or refreshed in a session only join the shared map once that session's
+    outermost transaction commits; releasing a savepoint doesn't count. A rollback forgets
+    them, so an id that was never committed can't be handed out.
+    Only misses and refreshes write, each in a savepoint of its own, so a suburb that can't
+    be stored fails just the listing naming it and hits cost no round trip at all.
+    """
+
+    def __init__(self):
+        self._suburbs: Dict[SuburbKey, Tuple[int, Optional[int]]] = {}
+        self._pending: "WeakKeyDictionary[Session, Dict[SuburbKey, Tuple[int, Optional[int]]]]" = WeakKeyDictionary()
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "inserted": 0, "refreshed": 0}
+
+    def __len__(self) -> int:
+        return len(self._suburbs)
+
+    def load(self, db: Session) -> int:
+        """Replace the cache with every suburb in the database, returns how many were loaded"""
+
+        # Suburbs aren't unique on (name, postcode), the oldest one is the one imports link to
+        rows = db.execute(
+            select(Suburb.name, Suburb.postcode, Suburb.id, Suburb.insights_hash)
+            .distinct(Suburb.name, Suburb.postcode)
+            .order_by(Suburb.name, Suburb.postcode, Suburb.id)
+        ).all()
+        with self._lock:
+            self._suburbs = {(row.name, row.postcode): (row.id, row.insights_hash) for row in rows}
+            self._loaded = True
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._suburbs.clear()
+            self._pending.clear()
+            self._loaded = False
+
+    def resolve(self, db: Session, property_data: Dict[str, Any]) -> int:
+        """Id of the listing's suburb, creating or refreshing the suburb when needed"""
+
+        suburb_name = property_data.get("suburb")
+        suburb_postcode = property_data.get("postcode")
+        if not suburb_name or not suburb_postcode:
+            raise ValueError("Missing required suburb information (name or postcode)")
+
+        if not property_data.get("suburbInsights"):
+            raise ValueError("No suburb information found in property data")
+
+        if not self._loaded:
+            self.load(db)
+
+        key = (suburb_name, suburb_postcode)
+        cached = self._lookup(db, key)
+        if cached is not None:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            with db.begin_nested():
+                cached = self._find_or_create(db, key, property_data)
+
+        suburb_id, stored_hash = cached
+        insights_hash = property_data.get("suburbInsightsHash")
+        if insights_hash is not None and insights_hash != stored_hash:
+            values = property_import_service.transform_suburb_data(property_data)
+            with db.begin_nested():
+                db.execute(
+                    update(Suburb)
+                    .where(Suburb.id == suburb_id)
+                    .values(**values, updated_at=datetime.now(UTC))
+                    .execution_options(synchronize_session=False)
+                )
+            self.stats["refreshed"] += 1
+            self._remember(db, key, suburb_id, insights_hash)
+
+        return suburb_id
+
+    def _lookup(self, db: Session, key: SuburbKey) -> Optional[Tuple[int, Optional[int]]]:
+        with self._lock:
+            pending = self._pending.get(db)
+            if pending and key in pending:
+                return pending[key]
+            return self._suburbs.get(key)
+
+    def _find_or_create(self, db: Session, key: SuburbKey, property_data: Dict[str, Any]) -> Tuple[int, Optional[int]]:
+        suburb_name, suburb_postcode = key
+
+        # Held until commit, so a concurrent importer of the same suburb waits and then finds this one's row
+        db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"suburb:{suburb_name}|{suburb_postcode}"))))
+
+        row = db.execute(
+            select(Suburb.id, Suburb.insights_hash)
+            .where(Suburb.name == suburb_name, Suburb.postcode == suburb_postcode)
+            .order_by(Suburb.id)
+            .limit(1)
+        ).first()
+        if row is not None:
+            self._remember(db, key, row.id, row.insights_hash)
+            return row.id, row.insights_hash
+
+        values = property_import_service.transform_suburb_data(property_data)
+        suburb_id = db.execute(
+            insert(Suburb)
+            .values(name=suburb_name, postcode=suburb_postcode, **values)
+            .on_conflict_do_nothing(index_elements=["suburb_profile_url"])
+            .returning(Suburb.id)
+        ).scalar()
+        if suburb_id is None:
+            # Same profile url under another name or postcode, link to that suburb like the unique url implies
+            suburb_id = db.execute(
+                select(Suburb.id).where(Suburb.suburb_profile_url == values["suburb_profile_url"])
+            ).scalar_one()
+        else:
+            self.stats["inserted"] += 1
+
+        self._remember(db, key, suburb_id, values["insights_hash"])
+        return suburb_id, values["insights_hash"]
+
+    def _remember(self, db: Session, key: SuburbKey, suburb_id: int, insights_hash: Optional[int]) -> None:
+        with self._lock:
+            pending = self._pending.get(db)
+            if pending is None:
+                pending = self._pending[db] = {}
+                event.listen(db, "after_commit", self._committed)
+                event.listen(db, "after_soft_rollback", self._rolled_back)
+            pending[key] = (suburb_id, insights_hash)
+
+    def _committed(self, db: Session) -> None:
+        # after_commit also fires when a savepoint is released, long before the rows are committed
+        if db.in_nested_transaction():
+            return
+
+        with self._lock:
+            self._suburbs.update(self._pending.get(db) or {})
+            self._pending[db] = {}
+
+    def _rolled_back(self, db: Session, previous_transaction) -> None:
+        # Savepoint rollbacks included, the pending ids may be gone; forgetting them only costs a lookup
+        with self._lock:
+            for key in self._pending.get(db) or {}:
+                self._suburbs.pop(key, None)
+            self._pending[db] = {}
+
+    def __str__(self) -> str:
+        return (
+            f"suburbs={len(self)} hits={self.stats['hits']} misses={self.stats['misses']} "
+            f"inserted={self.stats['inserted']} refreshed={self.stats['refreshed']}"
+        )
+
+
+suburb_cache = SuburbCache()
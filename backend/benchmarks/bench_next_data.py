@@ -0,0 +1,51 @@
+"""Micro-benchmark: byte-level __NEXT_DATA__ extraction vs a full selector parse
+
+Run from the backend directory:
+    python benchmarks/bench_next_data.py [--repeat 200]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from next_data import decode_json, extract_next_data, load_next_data, orjson, select_next_data
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def time_per_call(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat
+
+
+def bench_fixture(name: str, repeat: int) -> None:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        body = f.read()
+
+    # Both paths must agree before their speed is worth comparing
+    assert load_next_data(body) == select_next_data(body.decode("utf-8"))
+
+    selector_time = time_per_call(lambda: select_next_data(body.decode("utf-8")), repeat)
+    extract_time = time_per_call(lambda: extract_next_data(body), repeat)
+    fast_time = time_per_call(lambda: decode_json(extract_next_data(body)), repeat)
+
+    print(f"{name} ({len(body) / 1024:.0f} KiB)")
+    print(f"  selector + json.loads : {selector_time * 1000:8.3f} ms/page")
+    print(f"  byte scan only        : {extract_time * 1000:8.3f} ms/page")
+    print(f"  byte scan + decode    : {fast_time * 1000:8.3f} ms/page ({selector_time / fast_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"JSON decoder: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    for fixture in sorted(os.listdir(FIXTURES_DIR)):
+        if fixture.endswith(".html"):
+            bench_fixture(fixture, args.repeat)
@@ -0,0 +1,249 @@
+"""End-to-end scraper throughput against a local fake Domain server
+
+Serves search and detail pages built from the fixtures, with configurable latency and
+injected 5xx/429 responses, from a separate process. The scraper's pipeline runs
+against it unchanged (listings are spooled to a temp file, so no database is needed).
+
+Run from the backend directory:
+    python benchmarks/bench_scraper.py [--ranges 4 --shards 2 --latency 0.1 --error-rate 0.02]
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import statistics
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from httpx import AsyncClient
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import domain_properties_scraper as scraper
+from next_data import extract_next_data
+from crawl_spool import SpoolWriter
+from import_writer import ImportWriter
+from seen_index import SeenListingIndex
+from crawl_plan import CrawlShard, SearchSegment
+from price_planner import PROPERTIES_PER_PAGE
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# The detail fixture's listing id, swapped for the id of each requested listing
+DETAIL_FIXTURE_ID = b"2019000001"
+
+
+def load_fixture(name: str):
+    """Split a fixture page into (html before the JSON, decoded __NEXT_DATA__, html after)"""
+
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        body = f.read()
+
+    payload = extract_next_data(body)
+    start = body.index(payload)
+    return body[:start], json.loads(payload), body[start + len(payload) :]
+
+
+class FakeDomain:
+    """Builds search and detail pages for any price range, with listing ids unique per range"""
+
+    def __init__(self, listings_per_range: int):
+        self.listings_per_range = listings_per_range
+        self.search_head, self.search_data, self.search_tail = load_fixture("search_page.html")
+        with open(os.path.join(FIXTURES_DIR, "detail_page.html"), "rb") as f:
+            self.detail_body = f.read()
+
+        listings = self.search_data["props"]["pageProps"]["componentProps"]["listingsMap"]
+        self.listing_template = json.dumps(next(iter(listings.values())))
+
+    def search_page(self, price: str, page: int) -> bytes:
+        base = 1_000_000_000 + int(price.split("-")[0])
+        first = (page - 1) * PROPERTIES_PER_PAGE
+        ids = range(base + first, base + min(first + PROPERTIES_PER_PAGE, self.listings_per_range))
+
+        listings = {}
+        for listing_id in ids:
+            listing = json.loads(self.listing_template)
+            listing["id"] = listing_id
+            listing["listingModel"]["url"] = f"/example-street-sydney-nsw-2000-{listing_id}"
+            listings[str(listing_id)] = listing
+
+        component_props = self.search_data["props"]["pageProps"]["componentProps"]
+        component_props["listingsMap"] = listings
+        component_props["propertyCounts"] = {"house": self.listings_per_range}
+        component_props["currentPage"] = page
+        return self.search_head + json.dumps(self.search_data).encode() + self.search_tail
+
+    def detail_page(self, listing_id: str) -> bytes:
+        return self.detail_body.replace(DETAIL_FIXTURE_ID, listing_id.encode())
+
+
+def serve(port_pipe, listings_per_range: int, latency: float, error_rate: float, throttle_rate: float, gzip_level: int):
+    """Server process: answers like Domain after a random delay, or with an injected 503/429"""
+
+    domain = FakeDomain(listings_per_range)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency * random.uniform(0.5, 1.5))
+
+            roll = random.random()
+            if roll < throttle_rate:
+                return self.reply(429, b"Too Many Requests", {"retry-after": "1"})
+            if roll < throttle_rate + error_rate:
+                return self.reply(503, b"Service Unavailable")
+
+            url = urlsplit(self.path)
+            if url.path.startswith("/sale/"):
+                query = parse_qs(url.query)
+                body = domain.search_page(query["price"][0], int(query["page"][0]))
+            else:
+                body = domain.detail_page(url.path.rsplit("-", 1)[1])
+            self.reply(200, body)
+
+        def reply(self, status: int, body: bytes, headers=None):
+            self.send_response(status)
+            self.send_header("content-type", "text/html; charset=utf-8")
+            if gzip_level and "gzip" in self.headers.get("accept-encoding", ""):
+                body = gzip.compress(body, compresslevel=gzip_level)
+                self.send_header("content-encoding", "gzip")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    port_pipe.send(server.server_address[1])
+    server.serve_forever()
+
+
+class LocalClient(AsyncClient):
+    """Sends Domain requests to the fake server, timing each one and counting statuses"""
+
+    def __init__(self, port: int, **kwargs):
+        super().__init__(**kwargs)
+        self.port = port
+        self.latencies = []
+        self.statuses = Counter()
+
+    async def send(self, request, **kwargs):
+        request.url = request.url.copy_with(scheme="http", host="127.0.0.1", port=self.port)
+        started = time.perf_counter()
+        response = await super().send(request, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        self.statuses[response.status_code] += 1
+        return response
+
+
+def cpu_seconds() -> float:
+    # Parse pool workers are children of this process, the server is only reaped after the run
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+async def crawl(args, spool_path: str) -> dict:
+    existing_data = {
+        "scraped_count": 0,
+        "completed_price_ranges": [],
+        "claimed_ids": set(),
+        "seen_listings": SeenListingIndex(),
+        "spool": SpoolWriter(spool_path),
+        "journal": None,
+        "dead_letters": None,
+        "writer": ImportWriter(lambda: None),
+        "card_fingerprints": {},
+        "shard_stats": {},
+        "planned_shards": args.ranges,
+    }
+
+    pending = asyncio.Queue()
+    for index in range(args.ranges):
+        pending.put_nowait(CrawlShard(SearchSegment(), str(index * 50000), str((index + 1) * 50000)))
+
+    async def shard_worker():
+        while not pending.empty():
+            await scraper.process_price_range(pending.get_nowait(), existing_data)
+
+    try:
+        await asyncio.gather(*[shard_worker() for _ in range(args.shards)])
+    finally:
+        existing_data["spool"].close()
+        existing_data["writer"].close()
+    return existing_data
+
+
+def main(args) -> None:
+    port_receiver, port_sender = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(
+        target=serve,
+        args=(port_sender, args.listings_per_range, args.latency, args.error_rate, args.throttle_rate, args.gzip),
+        daemon=True,
+    )
+    server.start()
+    port = port_receiver.recv()
+
+    client = LocalClient(port, headers=scraper.client.headers, timeout=30.0)
+    scraper.client = client
+    if args.parse_workers > 0:
+        scraper.parse_executor = ProcessPoolExecutor(max_workers=args.parse_workers)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cpu_started = cpu_seconds()
+        started = time.monotonic()
+        try:
+            existing_data = asyncio.run(crawl(args, os.path.join(tmp_dir, "spool.ndjson")))
+        finally:
+            if scraper.parse_executor is not None:
+                scraper.parse_executor.shutdown()
+        elapsed = time.monotonic() - started
+        cpu = cpu_seconds() - cpu_started
+
+    server.terminate()
+    server.join()
+
+    pages = len(client.latencies)
+    listings = existing_data["scraped_count"]
+    expected = args.ranges * args.listings_per_range
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    p99 = statistics.quantiles(client.latencies, n=100)[98] if pages > 1 else 0.0
+
+    print(f"Listings   : {listings} of {expected} in {elapsed:.1f}s ({listings / max(elapsed, 1e-6):.1f} listings/sec)")
+    print(f"Pages      : {pages} requests, statuses {dict(sorted(client.statuses.items()))}")
+    print(f"Latency    : p50 {statistics.median(client.latencies) * 1000:.0f} ms, p99 {p99 * 1000:.0f} ms")
+    print(f"CPU        : {cpu:.2f}s total, {cpu * 1000 / max(pages, 1):.2f} ms/page")
+    print(f"Peak RSS   : {peak_rss:.0f} MiB")
+    print(f"Throttle   : {scraper.throttle}")
+    print(f"\nStages:\n{scraper.metrics.summary()}")
+    if args.metrics:
+        scraper.metrics.write(args.metrics)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ranges", type=int, default=4, help="price ranges to crawl")
+    parser.add_argument("--listings-per-range", type=int, default=400, help="listings the server reports per range")
+    parser.add_argument("--shards", type=int, default=1, help="price ranges crawled concurrently")
+    parser.add_argument("--latency", type=float, default=0.1, help="mean server response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument("--gzip", type=int, default=0, help="gzip level for response bodies (0 sends them plain)")
+    parser.add_argument("--parse-workers", type=int, default=0, help="worker processes for page parsing")
+    parser.add_argument("--metrics", help="also write the scraper's metrics to this file (.json or Prometheus text)")
+    main(parser.parse_args())
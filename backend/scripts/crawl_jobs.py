@@ -0,0 +1,103 @@
+import os
+import sys
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.crawl_job import crawl_job_service
+from crawl_plan import CrawlShard, SearchSegment
+
+DEFAULT_LEASE_SECONDS = 120
+
+
+class CrawlJobQueue:
+    """One worker's async handle on the crawl job table
+
+    Database calls run one at a time on a thread of their own with a dedicated session,
+    so heartbeats neither block the crawl's event loop nor share the import session.
+    """
+
+    def __init__(
+        self, session_factory: Callable[[], Session], worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS
+    ):
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+
+        self._session_factory = session_factory
+        self._db: Optional[Session] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crawl-jobs")
+
+    def _call(self, method: Callable, *args) -> Any:
+        # Runs on the job thread, which owns its session
+        if self._db is None:
+            self._db = self._session_factory()
+
+        try:
+            return method(self._db, *args)
+        except Exception:
+            self._db.rollback()
+            raise
+
+    async def _run(self, method: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, method, *args)
+
+    async def enqueue(self, shards: List[CrawlShard]) -> int:
+        jobs = [
+            {
+                "shard_key": shard.key,
+                "state": shard.segment.state,
+                "property_type": shard.segment.property_type,
+                "established_type": shard.segment.established_type,
+                "low_price": int(shard.low_price),
+                "high_price": int(shard.high_price),
+            }
+            for shard in shards
+        ]
+        return await self._run(crawl_job_service.enqueue, jobs)
+
+    async def claim(self) -> Optional[Tuple[int, CrawlShard]]:
+        """Lease the next job, returning its id and shard"""
+
+        def claim_shard(db: Session) -> Optional[Tuple[int, CrawlShard]]:
+            job = crawl_job_service.claim(db, self.worker_id, self.lease_seconds)
+            if job is None:
+                return None
+
+            segment = SearchSegment(job.state, job.property_type, job.established_type)
+            return job.id, CrawlShard(segment, str(job.low_price), str(job.high_price))
+
+        return await self._run(claim_shard)
+
+    async def heartbeat(self, job_id: int) -> bool:
+        return await self._run(crawl_job_service.heartbeat, job_id, self.worker_id, self.lease_seconds)
+
+    async def finish(self, job_id: int, listings: int) -> bool:
+        return await self._run(crawl_job_service.finish, job_id, self.worker_id, listings)
+
+    async def release(self, job_id: int, error: str) -> bool:
+        return await self._run(crawl_job_service.release, job_id, self.worker_id, error)
+
+    async def counts(self) -> Dict[str, int]:
+        return await self._run(crawl_job_service.counts)
+
+    async def keep_alive(self, job_id: int, on_lost: Callable[[], Any]) -> None:
+        """Heartbeat a job until cancelled, calling on_lost if another worker took it over"""
+
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await self.heartbeat(job_id):
+                    print(f"Lost the lease on job {job_id}, stopping it")
+                    on_lost()
+                    return
+            except Exception as e:
+                # The lease is still good until it expires, so the next beat can try again
+                print(f"Error sending heartbeat for job {job_id}: {e}")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+from typing import Dict, List, Optional, Sequence, Set
+
+
+class CrawlJournal:
+    """Append-only JSON-lines record of crawl progress, replayed by --resume
+
+    Events:
+        plan    the shards (segment and price range) the crawl covers
+        page    every listing up to this search page of a range has been stored
+        range   a shard was fully paginated and stored
+        stored  ids of a chunk of listings that was imported or spooled
+        failed  a listing that could not be scraped or stored
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        # Shards in their JSON form, [[state, type, established], low, high], see CrawlShard.from_journal
+        self.plan: Optional[List[Sequence]] = None
+        self.completed_ranges = set()
+        self.last_pages: Dict[str, int] = {}
+        self.failed: Dict[int, Dict] = {}
+        self.stored_ids: Set[int] = set()
+
+        if resume and os.path.exists(path):
+            self._replay()
+
+        # A fresh crawl starts a fresh journal
+        self._file = open(path, "a" if resume else "w")
+
+    def _replay(self) -> None:
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash
+
+                event = entry.get("event")
+                if event == "plan":
+                    self.plan = [tuple(shard) for shard in entry["ranges"]]
+                elif event == "page":
+                    self.last_pages[entry["range"]] = max(entry["page"], self.last_pages.get(entry["range"], 0))
+                elif event == "range":
+                    self.completed_ranges.add(entry["range"])
+                elif event == "stored":
+                    self.stored_ids.update(entry["listing_ids"])
+                elif event == "failed":
+                    self.failed[entry["listing_id"]] = entry
+
+    def _append(self, event: str, **fields) -> None:
+        self._file.write(json.dumps({"event": event, "at": time.time(), **fields}) + "\n")
+        self._file.flush()
+
+    def record_plan(self, shards: List[Sequence]) -> None:
+        self.plan = shards
+        self._append("plan", ranges=shards)
+
+    def record_page(self, shard: str, page: int) -> None:
+        self.last_pages[shard] = page
+        self._append("page", range=shard, page=page)
+
+    def record_range(self, shard: str) -> None:
+        self.completed_ranges.add(shard)
+        self._append("range", range=shard)
+
+    def record_stored(self, listing_ids: List[int]) -> None:
+        self._append("stored", listing_ids=listing_ids)
+
+    def record_failure(self, shard: str, listing_id: int, url: str, reason: str) -> None:
+        entry = {"range": shard, "listing_id": listing_id, "url": url, "reason": reason}
+        self.failed[listing_id] = entry
+        self._append("failed", **entry)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class RangeProgress:
+    """Tracks which search pages of a range have every one of their listings settled
+
+    A listing is settled once it is stored or journaled as failed. The journal's page
+    mark only advances over a contiguous run of settled pages, so resuming from it never
+    skips a listing that was still in the pipeline when the crawl stopped.
+    """
+
+    def __init__(self, journal: Optional[CrawlJournal], shard: str, start_page: int = 1):
+        self.journal = journal
+        self.shard = shard
+        self.last_page = start_page - 1
+        self._pending: Dict[int, int] = {}
+
+    def page_queued(self, page: int, listings: int) -> None:
+        self._pending[page] = listings
+        self._advance()
+
+    def listing_settled(self, page: int) -> None:
+        if page in self._pending:
+            self._pending[page] -= 1
+            self._advance()
+
+    def listing_failed(self, page: int, listing_id: int, url: str, reason: str) -> None:
+        if self.journal is not None:
+            self.journal.record_failure(self.shard, listing_id, url, reason)
+        self.listing_settled(page)
+
+    def _advance(self) -> None:
+        last_page = self.last_page
+        while self._pending.get(self.last_page + 1) == 0:
+            self.last_page += 1
+            del self._pending[self.last_page]
+
+        if self.journal is not None and self.last_page > last_page:
+            self.journal.record_page(self.shard, self.last_page)
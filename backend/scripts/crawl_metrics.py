@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# Recent observations kept per timing for its percentiles
+TIMING_SAMPLES = 2048
+
+# httpcore trace events that open and close each phase of a request, by protocol
+PHASE_EVENTS = {
+    "connect": ("connection.connect_tcp.started", "connection.connect_tcp.complete"),
+    "tls": ("connection.start_tls.started", "connection.start_tls.complete"),
+    "ttfb": ("send_request_headers.started", "receive_response_headers.complete"),
+}
+
+
+class Timing:
+    """Count, total and max of a duration, with percentiles over its most recent samples
+
+    Observed from the event loop and the import writer thread, so updates take a lock.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples: Deque[float] = deque(maxlen=TIMING_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(int(fraction * len(samples)), len(samples) - 1)]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class RequestTrace:
+    """An httpx `trace` extension that times the connect, TLS and time-to-first-byte phases
+
+    DNS resolution happens inside httpcore's TCP connect, so it is part of `connect`.
+    Reused connections skip connect and TLS and only report ttfb. `headers_at` is when
+    the response headers arrived, for timing the body.
+    """
+
+    def __init__(self, metrics: "CrawlMetrics"):
+        self.metrics = metrics
+        self.headers_at: Optional[float] = None
+        self._opened: Dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        for phase, (start_event, end_event) in PHASE_EVENTS.items():
+            if event_name.endswith(start_event):
+                self._opened[phase] = now
+            elif event_name.endswith(end_event) and phase in self._opened:
+                self.metrics.observe(phase, now - self._opened.pop(phase))
+                if phase == "ttfb":
+                    self.headers_at = now
+
+
+class CrawlMetrics:
+    """Per-stage timings, counters and gauges of a crawl, exported as JSON or Prometheus text
+
+    Timings cover the request phases (connect, tls, ttfb, body), page parsing and import
+    batches. Counters cover bytes downloaded, status codes and listings. Gauges are read
+    from callbacks at export time, so queue depths and writer backlog are always current.
+    Comparing the stage timings shows whether a slow crawl waits on the network, the
+    parser or the database.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.timings: Dict[str, Timing] = {}
+        self.counters: Counter = Counter()
+        self.status_codes: Counter = Counter()
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._queues: Dict[str, List[asyncio.Queue]] = {}
+
+    def observe(self, name: str, seconds: float) -> None:
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings.setdefault(name, Timing())
+        timing.observe(seconds)
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Register a gauge, read each time the metrics are exported"""
+        self._gauges[name] = read
+
+    @contextmanager
+    def track_queue(self, name: str, queue: asyncio.Queue) -> Iterator[None]:
+        """Include a queue in the `<name>_depth` gauge while the block runs
+
+        Every concurrent shard has its own pipeline queues, the gauge sums them.
+        """
+
+        queues = self._queues.setdefault(name, [])
+        queues.append(queue)
+        try:
+            yield
+        finally:
+            queues.remove(queue)
+
+    def request_trace(self) -> "RequestTrace":
+        return RequestTrace(self)
+
+    def record_response(self, status_code: int, num_bytes: int, headers_at: Optional[float]) -> None:
+        """Count a finished response, timing its body from when the headers arrived"""
+
+        self.status_codes[status_code] += 1
+        self.count("responses")
+        self.count("bytes_downloaded", num_bytes)
+        if headers_at is not None:
+            self.observe("body", time.perf_counter() - headers_at)
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        gauges = {name: read() for name, read in self._gauges.items()}
+        for name, queues in self._queues.items():
+            gauges[f"{name}_depth"] = sum(queue.qsize() for queue in queues)
+
+        return {
+            "elapsed_seconds": elapsed,
+            "listings_per_second": self.counters["listings"] / max(elapsed, 1e-6),
+            "counters": dict(self.counters),
+            "status_codes": {str(code): count for code, count in sorted(self.status_codes.items())},
+            "gauges": gauges,
+            "timings": {name: timing.snapshot() for name, timing in sorted(list(self.timings.items()))},
+        }
+
+    def render_prometheus(self) -> str:
+        snapshot = self.snapshot()
+        lines = [
+            f"crawl_elapsed_seconds {snapshot['elapsed_seconds']:.3f}",
+            f"crawl_listings_per_second {snapshot['listings_per_second']:.3f}",
+        ]
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"crawl_{name}_total {value}")
+        for code, count in snapshot["status_codes"].items():
+            lines.append(f'crawl_responses_by_status_total{{code="{code}"}} {count}')
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"crawl_{name} {value}")
+        for name, timing in snapshot["timings"].items():
+            lines.append(f'crawl_{name}_seconds{{quantile="0.5"}} {timing["p50"]:.6f}')
+            lines.append(f'crawl_{name}_seconds{{quantile="0.99"}} {timing["p99"]:.6f}')
+            lines.append(f"crawl_{name}_seconds_sum {timing['sum']:.6f}")
+            lines.append(f"crawl_{name}_seconds_count {timing['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Replace `path` with the current metrics, as JSON for a .json path and Prometheus text otherwise"""
+
+        if path.endswith(".json"):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.render_prometheus()
+
+        # Readers (node_exporter's textfile collector, tail -f) never see a half-written file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    async def write_every(self, path: str, interval: float) -> None:
+        """Rewrite the metrics file every `interval` seconds until cancelled"""
+
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.write(path)
+            except OSError as e:
+                print(f"Error writing metrics to {path}: {e}")
+
+    def summary(self) -> str:
+        """Human-readable report of the run, one stage per line"""
+
+        snapshot = self.snapshot()
+        counters = snapshot["counters"]
+        lines = [
+            f"Listings: {counters.get('listings', 0)} in {snapshot['elapsed_seconds']:.0f}s "
+            f"({snapshot['listings_per_second']:.1f} listings/sec)",
+            f"Responses: {counters.get('responses', 0)}, {counters.get('bytes_downloaded', 0) / 2**20:.1f} MiB, "
+            f"statuses {snapshot['status_codes']}",
+        ]
+        for name, timing in snapshot["timings"].items():
+            lines.append(
+                f"{name:>13}: n={timing['count']} mean={timing['mean'] * 1000:.1f}ms "
+                f"p50={timing['p50'] * 1000:.1f}ms p99={timing['p99'] * 1000:.1f}ms "
+                f"total={timing['sum']:.1f}s"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,139 @@
+import json
+import asyncio
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from price_planner import plan_price_ranges
+
+AUSTRALIAN_STATES = ("nsw", "vic", "qld", "wa", "sa", "tas", "act", "nt")
+
+
+def resolve_states(states: Sequence[str]) -> List[str]:
+    """State codes to crawl, with "all" standing for every state and territory
+
+    Raises ValueError for a code that isn't an Australian state or territory, which
+    would otherwise crawl an empty search for every price band.
+    """
+
+    if any(state.lower() == "all" for state in states):
+        return list(AUSTRALIAN_STATES)
+
+    resolved = [state.lower() for state in states]
+    unknown = [state for state in resolved if state not in AUSTRALIAN_STATES]
+    if unknown:
+        raise ValueError(f"Unknown states {', '.join(unknown)}, expected some of {', '.join(AUSTRALIAN_STATES)} or all")
+    return resolved
+
+
+class SearchSegment(NamedTuple):
+    """One state and property type of the search, everything but the price filter"""
+
+    state: str = "nsw"
+    property_type: str = "house"
+    established_type: str = "established"
+
+    def __str__(self) -> str:
+        return f"{self.state}/{self.property_type}"
+
+
+class CrawlShard(NamedTuple):
+    """A price band of a segment, the unit of work that is paginated, journaled and resumed"""
+
+    segment: SearchSegment
+    low_price: str
+    high_price: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.segment}:{self.low_price}-{self.high_price}"
+
+    @classmethod
+    def from_journal(cls, entry: Sequence) -> "CrawlShard":
+        """Rebuild a shard from its JSON form, [[state, type, established], low, high]"""
+
+        segment, low_price, high_price = entry
+        return cls(SearchSegment(*segment), str(low_price), str(high_price))
+
+
+class CrawlPlan:
+    """Declarative crawl coverage: states x property types x price bands
+
+    Price bands are fixed-width buckets, or with plan_ranges are sized per segment from
+    propertyCounts so each stays under the site's pagination cap. Plans are loaded from
+    a JSON file of the constructor's keyword arguments, e.g.
+
+        {"states": ["nsw", "vic"], "property_types": ["house", "apartment-unit-flat"],
+         "plan_ranges": true, "target_per_range": 800}
+    """
+
+    def __init__(
+        self,
+        states: Sequence[str] = ("nsw",),
+        property_types: Sequence[str] = ("house",),
+        established_type: str = "established",
+        min_price: int = 0,
+        max_price: int = 12000000,
+        band_width: int = 50000,
+        plan_ranges: bool = False,
+        target_per_range: int = 800,
+    ):
+        self.states = resolve_states(states)
+        self.property_types = list(property_types)
+        self.established_type = established_type
+        self.min_price = min_price
+        self.max_price = max_price
+        self.band_width = band_width
+        self.plan_ranges = plan_ranges
+        self.target_per_range = target_per_range
+
+    @classmethod
+    def load(cls, path: str) -> "CrawlPlan":
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def segments(self) -> List[SearchSegment]:
+        return [
+            SearchSegment(state, property_type, self.established_type)
+            for state in self.states
+            for property_type in self.property_types
+        ]
+
+    def price_bands(self) -> List[Tuple[str, str]]:
+        """Fixed-width price buckets covering min_price to max_price"""
+
+        bands = []
+        low_price = self.min_price
+        for high_price in range(self.min_price + self.band_width, self.max_price, self.band_width):
+            bands.append((str(low_price), str(high_price)))
+            low_price = high_price
+
+        return bands
+
+    async def shards(
+        self, count_listings: Optional[Callable[[SearchSegment, int, int], Awaitable[int]]] = None
+    ) -> List[CrawlShard]:
+        """Every shard of the plan, interleaved across segments so concurrent shards spread out
+
+        With plan_ranges, `count_listings` is required and all segments are planned at once.
+        """
+
+        async def segment_shards(segment: SearchSegment) -> List[CrawlShard]:
+            if not self.plan_ranges:
+                bands = self.price_bands()
+            else:
+
+                async def count_segment(low_price: int, high_price: int) -> int:
+                    return await count_listings(segment, low_price, high_price)
+
+                planned = await plan_price_ranges(
+                    count_segment, self.min_price, self.max_price, target=self.target_per_range
+                )
+                bands = [(str(low_price), str(high_price)) for low_price, high_price, _ in planned]
+
+            return [CrawlShard(segment, low_price, high_price) for low_price, high_price in bands]
+
+        per_segment = await asyncio.gather(*[segment_shards(segment) for segment in self.segments()])
+
+        shards = []
+        for index in range(max((len(planned) for planned in per_segment), default=0)):
+            shards.extend(planned[index] for planned in per_segment if index < len(planned))
+        return shards
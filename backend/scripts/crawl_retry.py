@@ -0,0 +1,47 @@
+import json
+import time
+import random
+
+# Statuses worth another try, anything else (404, 410, ...) won't change on a retry
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Attempts per url, including the first, before it goes to the dead-letter file
+MAX_ATTEMPTS = 4
+
+
+class ScrapeError(Exception):
+    """A url that could not be scraped, and whether trying it again could help"""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_retryable(error: Exception) -> bool:
+    # Timeouts, transport errors and block pages that fail to parse are all worth retrying
+    return error.retryable if isinstance(error, ScrapeError) else True
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff with jitter for the given (0-based) retry attempt"""
+
+    delay = min(cap, base * 2**attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class DeadLetterLog:
+    """JSON-lines file of urls that failed for good, with the reason and attempt count"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "a")
+
+    def record(self, url: str, reason: str, attempts: int, **fields) -> None:
+        self.count += 1
+        entry = {"url": url, "reason": reason, "attempts": attempts, "at": time.time(), **fields}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
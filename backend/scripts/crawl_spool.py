@@ -0,0 +1,193 @@
+import io
+import os
+import glob
+import gzip
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from next_data import decode_json
+from suburb_insights import suburb_key
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for .zst archives
+    zstandard = None
+
+ARCHIVE_SUFFIXES = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+
+# What reading a compressed file raises when its last member or frame was cut short
+TRUNCATED_ERRORS = (EOFError, OSError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+def encode_listings(properties: List[Dict], written_insights: Dict[str, int]) -> bytes:
+    """NDJSON lines for a chunk of listings, writing each suburb's interned insights only once
+
+    A listing whose suburbInsightsHash matches the insights last written for its suburb
+    (tracked in `written_insights`) is written without the block, and read_spool puts
+    it back. A changed payload is written out in full again.
+    """
+
+    lines = []
+    for property_data in properties:
+        insights_hash = property_data.get("suburbInsightsHash")
+        key = suburb_key(property_data)
+        if insights_hash is not None and key is not None and property_data.get("suburbInsights"):
+            if written_insights.get(key) == insights_hash:
+                property_data = {name: value for name, value in property_data.items() if name != "suburbInsights"}
+            else:
+                written_insights[key] = insights_hash
+        lines.append(json.dumps(property_data).encode() + b"\n")
+    return b"".join(lines)
+
+
+class SpoolWriter:
+    """Appends parsed listings to an NDJSON file, one listing per line
+
+    A line left unterminated by a crash is closed off before appending, so it stays one
+    unreadable line for read_spool to skip instead of swallowing the next listing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "ab")
+        self._written_insights: Dict[str, int] = {}
+
+        if self._file.tell() > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write(b"\n")
+
+    def write(self, properties: List[Dict]) -> None:
+        self._file.write(encode_listings(properties, self._written_insights))
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def open_ndjson(path: str, mode: str = "rb") -> BinaryIO:
+    """Open a plain, gzip or zstd NDJSON file, picked by its suffix
+
+    Reading runs across every gzip member or zstd frame in the file.
+    """
+
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=6)
+
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"Reading or writing {path} needs the zstandard package")
+        raw = open(path, mode)
+        if "r" in mode:
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True))
+        return zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+
+    return open(path, mode)
+
+
+class ArchiveWriter:
+    """Appends parsed listings to compressed NDJSON files partitioned by crawl date
+
+    Listings go to <directory>/<YYYY-MM-DD>.<run>.ndjson.gz (or .zst), rolling over to a
+    new file when the UTC date changes. Every run writes files of its own, named by its
+    start time and process id, so it never appends to a member a crashed run left
+    unterminated, which would make the rest of that file unreadable.
+    """
+
+    def __init__(self, directory: str, compression: str = "gzip"):
+        if compression not in ARCHIVE_SUFFIXES:
+            raise ValueError(f"Unknown archive compression {compression!r}")
+
+        self.directory = directory
+        self.suffix = ARCHIVE_SUFFIXES[compression]
+        self.run_id = f"{datetime.now(timezone.utc).strftime('%H%M%S')}-{os.getpid()}"
+        self.path: Optional[str] = None
+        self._file: Optional[BinaryIO] = None
+        self._written_insights: Dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _partition(self) -> BinaryIO:
+        crawl_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        path = os.path.join(self.directory, f"{crawl_date}.{self.run_id}{self.suffix}")
+        if path != self.path:
+            self.close()
+            self.path = path
+            self._file = open_ndjson(path, "ab")
+            self._written_insights = {}
+        return self._file
+
+    def write(self, properties: List[Dict]) -> None:
+        archive = self._partition()
+        archive.write(encode_listings(properties, self._written_insights))
+        archive.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def archive_partitions(directory: str, since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+    """Archive files in a directory in date order, optionally limited to crawl dates since/until (inclusive)"""
+
+    paths = []
+    for suffix in ARCHIVE_SUFFIXES.values():
+        paths.extend(glob.glob(os.path.join(directory, f"*{suffix}")))
+
+    partitions = []
+    for path in sorted(paths):
+        crawl_date = os.path.basename(path).split(".", 1)[0]
+        if (since is None or crawl_date >= since) and (until is None or crawl_date <= until):
+            partitions.append(path)
+    return partitions
+
+
+def complete_lines(f: BinaryIO, path: str) -> Iterator[bytes]:
+    """Lines of an open NDJSON file, stopping with a warning where a compressed file breaks off"""
+
+    lines = iter(f)
+    while True:
+        try:
+            line = next(lines)
+        except StopIteration:
+            return
+        except TRUNCATED_ERRORS as e:
+            print(f"Stopped reading {path} at a truncated or corrupt tail: {e}")
+            return
+        yield line
+
+
+def read_spool(path: str) -> Iterator[Dict]:
+    """Stream listings back out of a spool or archive file one at a time
+
+    Suburb insights written once per suburb are put back on the listings that refer to
+    them, all sharing the one copy. A line that doesn't decode, like the last one written
+    before a crash, is skipped with a warning, and a compressed file whose end was cut
+    short is read up to the break.
+    """
+
+    insights: Dict[str, Tuple[int, Dict]] = {}
+    with open_ndjson(path) as f:
+        for line_number, line in enumerate(complete_lines(f, path), 1):
+            if not line.strip():
+                continue
+
+            try:
+                property_data = decode_json(line)
+                if not isinstance(property_data, dict):
+                    raise ValueError("not a JSON object")
+            except ValueError as e:
+                print(f"Skipping unreadable line {line_number} of {path}: {e}")
+                continue
+
+            insights_hash = property_data.get("suburbInsightsHash")
+            key = suburb_key(property_data)
+            if insights_hash is not None and key is not None:
+                if property_data.get("suburbInsights"):
+                    insights[key] = (insights_hash, property_data["suburbInsights"])
+                elif key in insights and insights[key][0] == insights_hash:
+                    property_data["suburbInsights"] = insights[key][1]
+            yield property_data
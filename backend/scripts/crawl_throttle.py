@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Hashable, Optional
+
+# Status codes the site uses to push back on us
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+class AdaptiveThrottle:
+    """AIMD controller for the number of in-flight requests and their pacing
+
+    Concurrency grows by one slot for every window of healthy responses and is cut
+    multiplicatively when the site pushes back (429/503, timeouts) or latency rises
+    above target. Decreases are at least `target_latency` apart, so independent errors
+    landing close together count once. Pushback that persists, a second backoff before
+    the controller recovered from the first, also widens the gap between request starts,
+    which then decays again while responses stay healthy.
+
+    Requests waiting for a slot are queued per key (e.g. per price-range shard) and
+    freed slots are handed out round-robin across keys, so a shard with hundreds of
+    queued detail pages cannot starve one that only needs its next search page.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = 10,
+        min_concurrency: int = 1,
+        max_concurrency: int = 50,
+        target_latency: float = 2.0,
+        decrease_factor: float = 0.5,
+        min_delay: float = 0.0,
+        max_delay: float = 10.0,
+    ):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+
+        self.concurrency = float(initial_concurrency)
+        self.delay = min_delay
+        self.latency: Optional[float] = None  # EWMA of response latency
+        self.stats: Dict[str, int] = {"requests": 0, "throttled": 0, "timeouts": 0, "slow": 0}
+
+        self._in_flight = 0
+        self._successes = 0
+        self._next_start = 0.0
+        self._last_decrease = 0.0
+        self._backed_off = False  # a backoff happened since the last additive increase
+        self._waiters: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight"""
+        return max(self.min_concurrency, int(self.concurrency))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._waiters.values())
+
+    async def acquire(self, key: Hashable = None) -> None:
+        """Wait for a free slot, then for this request's start time"""
+
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(key, deque()).append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # The slot may have been handed over just before cancellation
+                if waiter.done() and not waiter.cancelled():
+                    self.release()
+                raise
+
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + self.delay
+        if start > now:
+            try:
+                await asyncio.sleep(start - now)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters, one key at a time in rotation"""
+
+        while self._in_flight < self.limit and self._waiters:
+            key, queue = self._waiters.popitem(last=False)
+            waiter = queue.popleft()
+            if queue:
+                self._waiters[key] = queue  # back of the rotation
+            if waiter.done():
+                continue  # cancelled while waiting
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable = None):
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, latency: float, status_code: Optional[int] = None, timed_out: bool = False) -> None:
+        """Feed one request outcome back into the controller"""
+
+        self.stats["requests"] += 1
+
+        if timed_out or status_code in THROTTLE_STATUS_CODES:
+            self.stats["timeouts" if timed_out else "throttled"] += 1
+            self._decrease(backoff=True)
+            return
+
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        if self.latency > self.target_latency:
+            self.stats["slow"] += 1
+            self._decrease(backoff=False)
+            return
+
+        # Additive increase: one extra slot per window of `limit` healthy responses (~one round trip)
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.delay = max(self.min_delay, self.delay / 2 if self.delay > 0.01 else 0.0)
+            self._backed_off = False
+            self._wake()
+
+    def _decrease(self, backoff: bool) -> None:
+        """Multiplicative decrease, at most once per cooldown so a burst of errors counts once"""
+
+        now = time.monotonic()
+        # One EWMA sample of a fast site is a few ms, far too short to tell a burst from pushback
+        cooldown = max(self.target_latency, self.latency or 0.0)
+        if now - self._last_decrease < cooldown:
+            return
+
+        self._last_decrease = now
+        self._successes = 0
+        self.concurrency = max(self.min_concurrency, self.concurrency * self.decrease_factor)
+        if backoff:
+            if self._backed_off:
+                self.delay = min(self.max_delay, max(self.delay * 2, 0.25))
+            self._backed_off = True
+
+    def __str__(self) -> str:
+        latency = f"{self.latency:.2f}s" if self.latency is not None else "n/a"
+        return (
+            f"concurrency={self.limit} in_flight={self._in_flight} waiting={self.waiting} "
+            f"delay={self.delay:.2f}s latency={latency} "
+            f"throttled={self.stats['throttled']} timeouts={self.stats['timeouts']}"
+        )
@@ -0,0 +1,174 @@
+import json
+import hashlib
+import jmespath
+from typing import Any, Dict, List, Optional
+
+from next_data import load_next_data
+from price_planner import MAX_SEARCH_PAGES, PROPERTIES_PER_PAGE
+
+
+def parse_search_card(listing_id: str, listing_model: Dict) -> Dict:
+    """Summary fields of a search result card, named like the detail page's fields"""
+
+    address = listing_model.get("address") or {}
+    features = listing_model.get("features") or {}
+    tags = listing_model.get("tags") or {}
+
+    return {
+        "listingId": int(listing_id),
+        "price": listing_model.get("price"),
+        "propertyType": features.get("propertyType"),
+        "beds": features.get("beds"),
+        "baths": features.get("baths"),
+        "parking": features.get("parking"),
+        "landSize": features.get("landSize"),
+        "address": address.get("street"),
+        "suburb": address.get("suburb"),
+        "postcode": address.get("postcode"),
+        "state": address.get("state"),
+        "tag": tags.get("tagText"),
+    }
+
+
+def stable_hash(data: Any) -> int:
+    """Signed 64-bit hash of JSON data, the same for equal data in any process or key order"""
+
+    digest = hashlib.blake2b(json.dumps(data, sort_keys=True).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def card_fingerprint(card: Dict) -> int:
+    """Signed 64-bit hash of a search card, which changes when its price, status or key fields do"""
+
+    return stable_hash(card)
+
+
+def parse_search_page(data: Dict) -> List[Dict]:
+    """Parse search pages data and extract property URLs, summary cards and card fingerprints"""
+
+    if not data:
+        return []
+
+    listings_map = data.get("listingsMap", {})
+    result = []
+
+    for listing_id in listings_map.keys():
+        item = listings_map[listing_id]
+        if "listingModel" in item and "url" in item["listingModel"]:
+            property_url = f"https://www.domain.com.au{item['listingModel']['url']}"
+            card = parse_search_card(listing_id, item["listingModel"])
+            result.append(
+                {
+                    "id": listing_id,
+                    "listingType": item.get("listingType"),
+                    "propertyUrl": property_url,
+                    "card": card,
+                    "fingerprint": card_fingerprint(card),
+                }
+            )
+
+    return result
+
+
+def parse_property_page(data: Dict) -> Optional[Dict]:
+    """Parse detailed property data"""
+
+    if not data:
+        return None
+
+    try:
+        result = jmespath.search(
+            """{
+        listingId: listingId,
+        listingUrl: listingUrl,
+        unitNumber: unitNumber,
+        streetNumber: streetNumber,
+        street: street,
+        suburb: suburb,
+        postcode: postcode,
+        state: stateAbbreviation,
+        createdOn: createdOn,
+        propertyType: propertyType,
+        beds: listingSummary.beds,
+        baths: listingSummary.baths,
+        parking: listingSummary.parking,
+        price: listingSummary.title,
+        listingSummary: listingSummary,
+        loanfinder: loanfinder,
+        features: features,
+        structuredFeatures: structuredFeatures,
+        suburbInsights: suburbInsights,
+        schools: schoolCatchment.schools,
+        gallery: gallery
+        }""",
+            data,
+        )
+
+        # Limit gallery slides to maximum 5 entries and keep only image urls
+        if result and "gallery" in result and "slides" in result["gallery"]:
+            slides = result["gallery"]["slides"][:5]  # Limit to 5 slides
+
+            image_urls = []
+            for slide in slides:
+                if "images" in slide:
+                    original = slide["images"].get("original", {})
+                    image_urls.append(original.get("url", ""))
+
+            result["gallery"] = image_urls
+
+        if result and "listingSummary" in result and "stats" in result["listingSummary"]:
+            stats = result["listingSummary"]["stats"]
+
+            land_area_value = 0
+            for stat in stats:
+                if "landArea" in stat.values():
+                    land_area_value = stat["value"]
+
+            result["listingSummary"]["stats"] = land_area_value
+
+        return result
+    except Exception as e:
+        print(f"Error parsing property page: {e}")
+        return None
+
+
+def parse_hidden_body(body: bytes) -> Dict:
+    """Parse JSON data from the __NEXT_DATA__ script tag of a raw page body"""
+
+    data = load_next_data(body)
+    return data["props"]["pageProps"]["componentProps"]
+
+
+def get_property_count(data: Dict) -> int:
+    """Total listings matching a search, from the search page's propertyCounts"""
+
+    return sum(data["propertyCounts"].values())
+
+
+def has_more_pages(data: Dict, page: int) -> bool:
+    """Check if there are more (reachable) pages of results"""
+
+    try:
+        # Getting total pages by ceiling property count division, capped at what the site will serve
+        total_pages = -(get_property_count(data) // -PROPERTIES_PER_PAGE)
+        return page <= min(total_pages, MAX_SEARCH_PAGES)
+
+    except Exception as e:
+        print(f"Error checking for more pages: {e}")
+        return False
+
+
+def parse_search_body(body: bytes) -> Dict:
+    """Parse a raw search page into a compact record of its listings and counts
+
+    Runs in the parse pool, so it takes and returns only plain picklable data.
+    """
+
+    data = parse_hidden_body(body)
+    return {"listings": parse_search_page(data), "propertyCounts": data.get("propertyCounts", {})}
+
+
+def parse_detail_body(body: bytes) -> Optional[Dict]:
+    """Parse a raw property page into its property record, runs in the parse pool"""
+
+    return parse_property_page(parse_hidden_body(body))
@@ -1,13 +1,33 @@
-import json
+import time
 import asyncio
-import jmespath
-from httpx import AsyncClient, Response
-from parsel import Selector
-from typing import List, Dict, Optional
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from httpx import AsyncClient, Response, TimeoutException
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Set, Tuple
 import os
 import sys
-
-from import_properties import import_properties
+import socket
+
+from import_writer import ImportWriter
+from import_properties import import_card_summaries
+from crawl_throttle import AdaptiveThrottle
+from crawl_metrics import CrawlMetrics
+from price_planner import MAX_RESULTS_PER_RANGE
+from crawl_plan import CrawlPlan, CrawlShard, SearchSegment, resolve_states
+from crawl_jobs import DEFAULT_LEASE_SECONDS, CrawlJobQueue
+from domain_parsing import (
+    get_property_count,
+    has_more_pages,
+    parse_detail_body,
+    parse_hidden_body,
+    parse_search_body,
+)
+from seen_index import SeenListingIndex
+from suburb_insights import SuburbInsightsInterner
+from crawl_spool import ARCHIVE_SUFFIXES, ArchiveWriter, SpoolWriter
+from crawl_journal import CrawlJournal, RangeProgress
+from response_cache import ResponseCache
+from crawl_retry import MAX_ATTEMPTS, RETRYABLE_STATUS_CODES, DeadLetterLog, ScrapeError, backoff_delay, is_retryable
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -27,210 +47,809 @@ client = AsyncClient(
     timeout=30.0,  # Add timeout to prevent hanging
 )
 
+# Sets in-flight request count and pacing from observed latency, 429/503s and timeouts
+throttle = AdaptiveThrottle()
 
-def parse_search_page(data: Dict) -> List[Dict]:
-    """Parse search pages data and extract property URLs"""
+# Stage timings, byte and status counts and pipeline gauges, exported with --metrics
+metrics = CrawlMetrics()
+metrics.gauge("throttle_concurrency", lambda: throttle.limit)
+metrics.gauge("throttle_in_flight", lambda: throttle.in_flight)
+metrics.gauge("throttle_waiting", lambda: throttle.waiting)
+metrics.gauge("throttle_delay_seconds", lambda: throttle.delay)
 
-    if not data:
-        return []
+# One shared copy of each suburb's insights block across all parsed listings
+suburb_insights = SuburbInsightsInterner()
 
-    listings_map = data.get("listingsMap", {})
-    result = []
+# Set by run() when responses should be cached on disk
+response_cache: Optional[ResponseCache] = None
 
-    for listing_id in listings_map.keys():
-        item = listings_map[listing_id]
-        if "listingModel" in item and "url" in item["listingModel"]:
-            property_url = f"https://www.domain.com.au{item['listingModel']['url']}"
-            result.append({"id": listing_id, "listingType": item.get("listingType"), "propertyUrl": property_url})
+# Set by run() to parse pages in worker processes instead of on the event loop
+parse_executor: Optional[ProcessPoolExecutor] = None
 
-    return result
+# Bound on listing urls / parsed properties buffered between pipeline stages
+PIPELINE_QUEUE_SIZE = 100
 
+# Parsed properties are imported (or spooled) and dropped in chunks of this size
+STORE_CHUNK_SIZE = 200
 
-def parse_property_page(data: Dict) -> Optional[Dict]:
-    """Parse detailed property data"""
+DEFAULT_SEEN_INDEX_PATH = "seen_listings.idx"
+DEFAULT_JOURNAL_PATH = "crawl_journal.jsonl"
+DEFAULT_DEAD_LETTER_PATH = "dead_letters.jsonl"
+DEFAULT_REJECTED_PATH = "rejected_listings.jsonl"
 
-    if not data:
-        return None
 
-    try:
-        result = jmespath.search(
-            """{
-        listingId: listingId,
-        listingUrl: listingUrl,
-        unitNumber: unitNumber,
-        streetNumber: streetNumber,
-        street: street,
-        suburb: suburb,
-        postcode: postcode,
-        state: stateAbbreviation,
-        createdOn: createdOn,
-        propertyType: propertyType,
-        beds: listingSummary.beds,
-        baths: listingSummary.baths,
-        parking: listingSummary.parking,
-        price: listingSummary.title,
-        listingSummary: listingSummary,
-        loanfinder: loanfinder,
-        features: features,
-        structuredFeatures: structuredFeatures,
-        suburbInsights: suburbInsights,
-        schools: schoolCatchment.schools,
-        gallery: gallery
-        }""",
-            data,
-        )
+def parse_hidden_data(response: Response) -> Dict:
+    """Parse JSON data from the __NEXT_DATA__ script tag"""
 
-        # Limit gallery slides to maximum 5 entries and keep only image urls
-        if result and "gallery" in result and "slides" in result["gallery"]:
-            slides = result["gallery"]["slides"][:5]  # Limit to 5 slides
+    return parse_hidden_body(response.content)
 
-            image_urls = []
-            for slide in slides:
-                if "images" in slide:
-                    original = slide["images"].get("original", {})
-                    image_urls.append(original.get("url", ""))
 
-            result["gallery"] = image_urls
+async def parse_off_loop(parser: Callable[[bytes], Any], body: bytes) -> Any:
+    """Run a raw-body parser in the parse pool, or inline when no pool is configured"""
 
-        if result and "listingSummary" in result and "stats" in result["listingSummary"]:
-            stats = result["listingSummary"]["stats"]
+    with metrics.time(parser.__name__.removesuffix("_body")):
+        if parse_executor is None:
+            return parser(body)
+        return await asyncio.get_running_loop().run_in_executor(parse_executor, parser, body)
 
-            land_area_value = 0
-            for stat in stats:
-                if "landArea" in stat.values():
-                    land_area_value = stat["value"]
 
-            result["listingSummary"]["stats"] = land_area_value
+async def fetch(url: str, shard: Optional[str] = None) -> Response:
+    """GET a url within the throttle's limits and report the outcome back to it
 
-        return result
-    except Exception as e:
-        print(f"Error parsing property page: {e}")
-        return None
+    With the response cache enabled, cached urls are revalidated with ETag/Last-Modified
+    when the server supplied them, and every 200 body is stored.
+    """
 
+    cached = response_cache.latest(url) if response_cache is not None else None
 
-def parse_hidden_data(response: Response) -> Dict:
-    """Parse JSON data from script tags"""
+    async with throttle.slot(shard):
+        started = time.monotonic()
+        trace = metrics.request_trace()
+        try:
+            headers = response_cache.validators(cached) if response_cache is not None else {}
+            response = await client.get(url, headers=headers, extensions={"trace": trace})
+        except TimeoutException:
+            throttle.record(time.monotonic() - started, timed_out=True)
+            metrics.count("timeouts")
+            raise
 
-    selector = Selector(response.text)
-    script = selector.xpath("//script[@id='__NEXT_DATA__']/text()").get()
+        throttle.record(time.monotonic() - started, response.status_code)
+        metrics.observe("request", time.monotonic() - started)
+        metrics.record_response(response.status_code, response.num_bytes_downloaded, trace.headers_at)
 
-    if not script:
-        raise ValueError("Could not find __NEXT_DATA__ script tag")
+    if response_cache is not None:
+        if response.status_code == 304 and cached:
+            return response_cache.revalidated(cached)
+        if response.status_code == 200:
+            response_cache.store(url, response)
 
-    data = json.loads(script)
-    return data["props"]["pageProps"]["componentProps"]
+    return response
 
 
-def has_more_pages(data: Dict, page: int) -> bool:
-    """Check if there are more pages of results"""
+async def scrape_property(url: str, shard: Optional[str] = None) -> Optional[Dict]:
+    """Fetch and parse a single property detail page"""
 
-    PROPERTIES_PER_PAGE = 20
-    try:
-        # Getting total pages by ceiling property count division
-        property_count = sum(data["propertyCounts"].values())
-        return page <= -(property_count // -PROPERTIES_PER_PAGE)
+    response = await fetch(url, shard)
+    if response.status_code != 200:
+        raise ScrapeError(f"Status {response.status_code}", retryable=response.status_code in RETRYABLE_STATUS_CODES)
 
-    except Exception as e:
-        print(f"Error checking for more pages: {e}")
-        return False
+    property_data = await parse_off_loop(parse_detail_body, response.content)
+    if property_data:
+        property_data["scraped_url"] = url
+        suburb_insights.intern(property_data)
 
+    return property_data
 
-async def scrape_properties_for_page(property_urls: List[str], batch_size: int = 20) -> List[Dict]:
-    """Scrape detailed property data for a single page's worth of properties"""
 
-    page_properties = []
+SEARCH_URL_PREFIX = "https://www.domain.com.au/sale/?"
 
-    for i in range(0, len(property_urls), batch_size):
-        batch_urls = property_urls[i : i + batch_size]
-        tasks = [client.get(url) for url in batch_urls]
 
-        try:
-            responses = await asyncio.gather(*tasks)
-            for response, url in zip(responses, batch_urls):
-                if response.status_code == 200:
-                    data = parse_hidden_data(response)
-                    property_data = parse_property_page(data)
-                    if property_data:
-                        property_data["scraped_url"] = url
-                        page_properties.append(property_data)
-                else:
-                    print(f"Failed to fetch property {url}: Status {response.status_code}")
-
-            await asyncio.sleep(0.2)
+def search_url(segment: SearchSegment, low_price: str, high_price: str, page: int = 1) -> str:
+    """Search results url for one page of a price range within a state and property type"""
 
-        except Exception as e:
-            print(f"Error processing batch: {e}")
-            continue
+    return (
+        f"{SEARCH_URL_PREFIX}ptype={segment.property_type}&price={low_price}-{high_price}"
+        f"&establishedtype={segment.established_type}&ssubs=0&sort=price-asc&state={segment.state}&page={page}"
+    )
 
-    return page_properties
 
+async def count_listings(segment: SearchSegment, low_price: int, high_price: int) -> int:
+    """Number of listings in a price range of a segment, read from its first search page"""
 
-async def process_price_range(db: Session, low_price: str, high_price: str, existing_data: Dict) -> None:
-    """Process all pages for a single suburb"""
+    response = await fetch(search_url(segment, str(low_price), str(high_price)), "planner")
+    if response.status_code != 200:
+        raise ValueError(f"Failed to count {segment} ${low_price} - ${high_price}: Status {response.status_code}")
 
-    base_url = f"https://www.domain.com.au/sale/?ptype=house&price={low_price}-{high_price}&establishedtype=established&ssubs=0&sort=price-asc&state=nsw"
+    return get_property_count(parse_hidden_data(response))
 
-    batch_data = {"properties": [], "completed_price_ranges": []}
 
-    page = 1
-    print(f"\nProcessing ${low_price} - ${high_price}")
-    while True:
-        url = f"{base_url}&page={page}"
+async def fetch_search_page(url: str, shard: str, existing_data: Dict) -> Optional[Dict]:
+    """Fetch and parse a search page, retrying transient failures with backoff
+
+    Returns None, after recording the url as a dead letter, once retries run out.
+    """
 
+    for attempt in range(MAX_ATTEMPTS):
         try:
-            response = await client.get(url)
+            response = await fetch(url, shard)
             if response.status_code != 200:
-                print(f"Failed to fetch page {page} for ${low_price} - ${high_price}: Status {response.status_code}")
+                raise ScrapeError(
+                    f"Status {response.status_code}", retryable=response.status_code in RETRYABLE_STATUS_CODES
+                )
+            return await parse_off_loop(parse_search_body, response.content)
+
+        except Exception as e:
+            error = e
+            if not is_retryable(e) or attempt + 1 == MAX_ATTEMPTS:
                 break
+            await asyncio.sleep(backoff_delay(attempt))
 
-            data = parse_hidden_data(response)
-            search_results = parse_search_page(data)
+    print(f"Failed to fetch search page {url} after {attempt + 1} attempts: {error}")
+    if existing_data.get("dead_letters") is not None:
+        existing_data["dead_letters"].record(url, str(error), attempt + 1, range=shard)
+    return None
 
-            if not search_results:
-                print(f"No properties found for range ${low_price} - ${high_price}")
-                break
 
-            # Filter out already scraped URLs
-            property_urls = [item["propertyUrl"] for item in search_results]
-            existing_urls = {prop.get("scraped_url") for prop in existing_data["properties"]}
-            new_urls = [url for url in property_urls if url not in existing_urls]
+async def paginate_price_range(
+    shard: CrawlShard, existing_data: Dict, url_queue: asyncio.Queue, progress: RangeProgress
+) -> bool:
+    """Walk the search pages of a shard's price range, queueing new listings for the detail workers
+
+    Starts after the last page the journal has settled, and returns whether the range
+    was paginated to the end.
+    """
+
+    segment, low_price, high_price = shard
+    seen_listings = existing_data["seen_listings"]
+    claimed_ids = existing_data["claimed_ids"]
+
+    page = progress.last_page + 1
+    while True:
+        url = search_url(segment, low_price, high_price, page)
+
+        try:
+            data = await fetch_search_page(url, shard.key, existing_data)
+            if data is None:
+                return False
+
+            search_results = data["listings"]
 
-            if new_urls:
-                page_properties = await scrape_properties_for_page(new_urls)
-                if page_properties:
-                    batch_data["properties"].extend(page_properties)
-                    print(f"Adding {len(page_properties)} new properties - Page {page}")
+            if not search_results:
+                print(f"No properties found for {segment} ${low_price} - ${high_price}")
+                return True
+
+            if page == 1 and get_property_count(data) > MAX_RESULTS_PER_RANGE:
+                print(
+                    f"Range {segment} ${low_price} - ${high_price} has {get_property_count(data)} listings, "
+                    f"only the first {MAX_RESULTS_PER_RANGE} are reachable"
+                )
+
+            # Filter out already scraped listings, and listings another shard is already scraping
+            new_items = [
+                item
+                for item in search_results
+                if item["id"] not in seen_listings and int(item["id"]) not in claimed_ids
+            ]
+
+            # Known listings whose search card changed are fetched again and updated in place
+            changed = changed_listings(search_results, seen_listings)
+            refetch = [
+                item
+                for item in changed
+                if seen_listings.fingerprint(item["id"]) is not None and int(item["id"]) not in claimed_ids
+            ]
+            if changed and existing_data.get("index_crawl"):
+                await refresh_from_cards(changed, refetch, existing_data)
+            new_items += refetch
+
+            claimed_ids.update(int(item["id"]) for item in new_items)
+            existing_data["card_fingerprints"].update((int(item["id"]), item["fingerprint"]) for item in new_items)
+            progress.page_queued(page, len(new_items))
+
+            # Blocks once the detail workers fall behind, so pagination only runs a few pages ahead
+            for item in new_items:
+                await url_queue.put((page, int(item["id"]), item["propertyUrl"], 0))
+
+            if new_items:
+                print(f"Queued {len(new_items)} new properties - Page {page} ({throttle}, {existing_data['writer']})")
 
             page += 1
 
             if not has_more_pages(data, page):
-                print(f"No more pages for range ${low_price} - ${high_price}")
-                break
+                print(f"No more pages for {segment} ${low_price} - ${high_price}")
+                return True
+
+        except Exception as e:
+            print(f"Error processing page {page} for {segment} ${low_price} - ${high_price}: {e}")
+            return False
+
+
+def changed_listings(search_results: List[Dict], seen_listings: SeenListingIndex) -> List[Dict]:
+    """Known listings whose search card no longer matches the fingerprint recorded for them"""
+
+    return [
+        item
+        for item in search_results
+        if item["id"] in seen_listings and seen_listings.fingerprint(item["id"]) != item["fingerprint"]
+    ]
 
+
+async def refresh_from_cards(changed: List[Dict], refetch: List[Dict], existing_data: Dict) -> None:
+    """Index crawl: update changed listings straight from their search cards on the import writer
+
+    Listings being refetched get their new fingerprint once the detail page is stored.
+    The rest, seen before fingerprints were recorded, get theirs with the summary, in the
+    property table as well as the seen index, so a run seeded from the database agrees.
+    """
+
+    seen_listings = existing_data["seen_listings"]
+    refetch_ids = {item["id"] for item in refetch}
+    baseline = {int(item["id"]): item["fingerprint"] for item in changed if item["id"] not in refetch_ids}
+    cards = [
+        {**item["card"], "cardFingerprint": item["fingerprint"]} if int(item["id"]) in baseline else item["card"]
+        for item in changed
+    ]
+
+    def refreshed(future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            print(f"Error refreshing listings from search cards: {future.exception()}")
+            return
+        existing_data["refreshed_count"] += len(changed)
+        seen_listings.update_fingerprints(baseline)
+
+    written = await existing_data["writer"].submit(cards, import_card_summaries)
+    written.add_done_callback(refreshed)
+
+
+def give_up_listing(
+    existing_data: Dict, progress: RangeProgress, page: int, listing_id: int, url: str, reason: str, attempts: int
+) -> None:
+    """Record a listing that won't be retried in this run in the dead-letter file and journal"""
+
+    existing_data["card_fingerprints"].pop(listing_id, None)
+    if existing_data.get("dead_letters") is not None:
+        existing_data["dead_letters"].record(url, reason, attempts, range=progress.shard, listing_id=listing_id)
+    progress.listing_failed(page, listing_id, url, reason)
+
+
+async def requeue_later(url_queue: asyncio.Queue, item: Tuple, delay: float) -> None:
+    """Put a failed listing back on the url queue once its backoff delay has passed"""
+
+    try:
+        await asyncio.sleep(delay)
+        await url_queue.put(item)
+    finally:
+        # Settles the failed attempt, the requeued item is tracked by the queue on its own
+        url_queue.task_done()
+
+
+async def detail_worker(
+    shard: str,
+    url_queue: asyncio.Queue,
+    result_queue: asyncio.Queue,
+    progress: RangeProgress,
+    existing_data: Dict,
+    pending_retries: Set[asyncio.Task],
+) -> None:
+    """Scrape queued listings until cancelled, passing parsed properties to the sink
+
+    Each listing succeeds or fails on its own. Transient failures go back on the queue
+    after an exponential backoff, up to MAX_ATTEMPTS, then to the dead-letter file.
+    """
+
+    while True:
+        page, listing_id, url, attempt = await url_queue.get()
+        requeued = False
+        try:
+            property_data = await scrape_property(url, shard)
+            if property_data:
+                property_data["cardFingerprint"] = existing_data["card_fingerprints"].get(listing_id)
+                await result_queue.put((page, property_data))
+            else:
+                give_up_listing(existing_data, progress, page, listing_id, url, "no property data", attempt + 1)
         except Exception as e:
-            print(f"Error processing page {page} for range ${low_price} - ${high_price}: {e}")
-            break
+            if is_retryable(e) and attempt + 1 < MAX_ATTEMPTS:
+                retry = (page, listing_id, url, attempt + 1)
+                task = asyncio.create_task(requeue_later(url_queue, retry, backoff_delay(attempt)))
+                pending_retries.add(task)
+                task.add_done_callback(pending_retries.discard)
+                requeued = True
+            else:
+                print(f"Giving up on property {url} after {attempt + 1} attempts: {e}")
+                give_up_listing(existing_data, progress, page, listing_id, url, str(e), attempt + 1)
+        finally:
+            if not requeued:
+                url_queue.task_done()
+
+
+async def store_properties(properties: List[Dict], existing_data: Dict) -> asyncio.Future:
+    """Hand a chunk of parsed properties to the spool or the import writer
+
+    Only waits while the writer is backed up. The returned future resolves once the chunk
+    is written, so the crawl keeps fetching while the database commits.
+    """
+
+    archive = existing_data.get("archive")
+    if archive is not None:
+        try:
+            archive.write(properties)
+        except Exception as archive_error:
+            print(f"Error archiving properties: {archive_error}")
+
+    spool = existing_data.get("spool")
+    if spool is None:
+        return await existing_data["writer"].submit(properties)
 
-    existing_data["completed_price_ranges"].append(f"{low_price}-{high_price}")
+    written = asyncio.get_running_loop().create_future()
     try:
-        await import_properties(db, batch_data)
-        existing_data["properties"].extend(batch_data["properties"])
+        spool.write(properties)
+        written.set_result(None)
+    except Exception as spool_error:
+        written.set_exception(spool_error)
+    return written
+
+
+def properties_stored(properties: List[Dict], existing_data: Dict) -> None:
+    """Keep only the ids of a chunk that is safely stored"""
+
+    listing_ids = [int(prop["listingId"]) for prop in properties if prop.get("listingId")]
+    if existing_data.get("journal") is not None:
+        existing_data["journal"].record_stored(listing_ids)
+    existing_data["seen_listings"].update(listing_ids)
+
+    card_fingerprints = existing_data.get("card_fingerprints", {})
+    for listing_id in listing_ids:
+        card_fingerprints.pop(listing_id, None)
+    stored_fingerprints = {
+        int(prop["listingId"]): prop["cardFingerprint"]
+        for prop in properties
+        if prop.get("listingId") and prop.get("cardFingerprint") is not None
+    }
+    existing_data["seen_listings"].update_fingerprints(stored_fingerprints)
+    existing_data["claimed_ids"].difference_update(listing_ids)
+    existing_data["scraped_count"] += len(properties)
+    metrics.count("listings", len(properties))
+
+
+async def settle_chunk(chunk: List[Tuple], stored: asyncio.Future, existing_data: Dict, progress: RangeProgress) -> int:
+    """Wait for a chunk of (page, property) results to be stored, then settle its listings
+
+    Listings the import rejected are journaled as failed rather than stored, so they are
+    neither marked seen nor fingerprinted, and the next run retries them.
+    """
+
+    try:
+        # Spooled chunks aren't imported yet, so nothing in them was rejected
+        rejected = await stored or {}
     except Exception as import_error:
         print(f"Error importing properties: {import_error}")
+        for page, property_data in chunk:
+            listing_id = property_data.get("listingId")
+            progress.listing_failed(page, listing_id, property_data.get("scraped_url"), "import failed")
+        return 0
+
+    def was_rejected(property_data: Dict) -> bool:
+        return bool(property_data.get("listingId")) and int(property_data["listingId"]) in rejected
+
+    stored_properties = [property_data for _, property_data in chunk if not was_rejected(property_data)]
+    properties_stored(stored_properties, existing_data)
+    for page, property_data in chunk:
+        if was_rejected(property_data):
+            listing_id = int(property_data["listingId"])
+            existing_data.get("card_fingerprints", {}).pop(listing_id, None)
+            reason = f"import rejected: {rejected[listing_id]}"
+            progress.listing_failed(page, listing_id, property_data.get("scraped_url"), reason)
+        else:
+            progress.listing_settled(page)
+    return len(stored_properties)
+
+
+async def collect_results(result_queue: asyncio.Queue, existing_data: Dict, progress: RangeProgress) -> int:
+    """Sink for parsed properties, storing them in chunks until it receives None
+
+    Full property dicts are dropped once stored, so memory stays flat however big the crawl.
+    """
+
+    chunk = []
+    settling = []
+    while True:
+        item = await result_queue.get()
+        if item is not None:
+            chunk.append(item)
+
+        if chunk and (item is None or len(chunk) >= STORE_CHUNK_SIZE):
+            stored = await store_properties([property_data for _, property_data in chunk], existing_data)
+            settling.append(asyncio.create_task(settle_chunk(chunk, stored, existing_data, progress)))
+            chunk = []
+
+        if item is None:
+            return sum(await asyncio.gather(*settling))
+
+
+async def run_pipeline(shard: str, existing_data: Dict, feed, detail_workers: int = 0) -> Tuple[int, bool]:
+    """Run detail workers and the result sink while `feed` fills the url queue
+
+    Returns the number of properties stored and whether the feed finished. `feed` is
+    called with the url queue and the range's progress tracker and returns whether it
+    produced all of its work.
+    """
+
+    journal = existing_data.get("journal")
+    start_page = journal.last_pages.get(shard, 0) + 1 if journal is not None else 1
+    progress = RangeProgress(journal, shard, start_page)
+
+    url_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    result_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    pending_retries: Set[asyncio.Task] = set()
+
+    sink = asyncio.create_task(collect_results(result_queue, existing_data, progress))
+    workers = [
+        asyncio.create_task(detail_worker(shard, url_queue, result_queue, progress, existing_data, pending_retries))
+        for _ in range(detail_workers or throttle.max_concurrency)
+    ]
+    with metrics.track_queue("url_queue", url_queue), metrics.track_queue("result_queue", result_queue):
+        try:
+            finished = await feed(url_queue, progress)
+            await url_queue.join()
+        finally:
+            for task in [*workers, *pending_retries]:
+                task.cancel()
+            await asyncio.gather(*workers, *pending_retries, return_exceptions=True)
+            await result_queue.put(None)
+            stored = await sink
 
+    if finished and journal is not None:
+        journal.record_range(shard)
+    return stored, finished
+
+
+async def process_price_range(shard: CrawlShard, existing_data: Dict, detail_workers: int = 0) -> bool:
+    """Process all pages for a single price range of a state and property type
+
+    Search pagination, detail fetching and result collection run as a pipeline over
+    bounded queues, so detail pages from page N are still downloading while page N+1
+    is requested. `detail_workers` defaults to the throttle's maximum concurrency.
+    Returns whether the range was paginated to the end.
+    """
+
+    print(f"\nProcessing {shard.segment} ${shard.low_price} - ${shard.high_price}")
+    started = time.monotonic()
+
+    async def feed(url_queue: asyncio.Queue, progress: RangeProgress) -> bool:
+        return await paginate_price_range(shard, existing_data, url_queue, progress)
+
+    scraped, finished = await run_pipeline(shard.key, existing_data, feed, detail_workers)
+
+    elapsed = time.monotonic() - started
+    existing_data["shard_stats"][shard.key] = {"segment": str(shard.segment), "listings": scraped, "seconds": elapsed}
+    existing_data["completed_price_ranges"].append(shard.key)
+    existing_data["seen_listings"].save()
+
+    done = len(existing_data["completed_price_ranges"])
+    print(
+        f"[{done}/{existing_data.get('planned_shards', done)}] {shard.key}: scraped {scraped} properties "
+        f"in {elapsed:.1f}s ({scraped / max(elapsed, 1e-6):.1f} listings/sec)"
+    )
+    return finished
+
+
+async def retry_failed_listings(existing_data: Dict) -> None:
+    """Scrape listings the journal recorded as failed that haven't been stored since"""
+
+    journal = existing_data["journal"]
+    seen_listings = existing_data["seen_listings"]
+    failed = [entry for listing_id, entry in journal.failed.items() if listing_id not in seen_listings]
+    if not failed:
+        return
+
+    print(f"\nRetrying {len(failed)} listings that failed in the previous run")
+
+    async def feed(url_queue: asyncio.Queue, progress: RangeProgress) -> bool:
+        for entry in failed:
+            existing_data["claimed_ids"].add(entry["listing_id"])
+            await url_queue.put((0, entry["listing_id"], entry["url"], 0))
+        return False  # never mark the pseudo-range as complete
+
+    await run_pipeline("retry", existing_data, feed)
+    existing_data["seen_listings"].save()
+
+
+async def replay_cache(existing_data: Dict) -> None:
+    """Re-parse and store every cached detail page without touching the network
+
+    Lets parsing and importing be re-run after a parser change, and doubles as a
+    deterministic benchmark of the parse/import path.
+    """
+
+    started = time.monotonic()
+    parse_time = 0.0
+    pages = 0
+    chunk = []
+    settling = []
+    progress = RangeProgress(None, "replay")
+
+    for url, body in response_cache.iter_latest():
+        if url.startswith(SEARCH_URL_PREFIX):
+            continue
+
+        pages += 1
+        parse_started = time.perf_counter()
+        try:
+            property_data = parse_detail_body(body)
+        except Exception as e:
+            print(f"Error parsing cached property {url}: {e}")
+            continue
+        finally:
+            parse_time += time.perf_counter() - parse_started
+
+        if property_data:
+            property_data["scraped_url"] = url
+            chunk.append((0, suburb_insights.intern(property_data)))
+
+        if len(chunk) >= STORE_CHUNK_SIZE:
+            stored = await store_properties([property_data for _, property_data in chunk], existing_data)
+            settling.append(asyncio.create_task(settle_chunk(chunk, stored, existing_data, progress)))
+            chunk = []
+
+    if chunk:
+        stored = await store_properties([property_data for _, property_data in chunk], existing_data)
+        settling.append(asyncio.create_task(settle_chunk(chunk, stored, existing_data, progress)))
+    await asyncio.gather(*settling)
+
+    elapsed = time.monotonic() - started
+    stored = existing_data["scraped_count"]
+    print(f"\nReplayed {pages} cached pages, stored {stored} properties in {elapsed:.1f}s")
+    print(f"Parse: {parse_time * 1000 / max(pages, 1):.2f} ms/page")
+    print(f"Import: {existing_data['writer']}")
+    print(f"Overall: {stored / max(elapsed, 1e-6):.1f} listings/sec")
+
+
+def print_shard_stats(shard_stats: Dict[str, Dict]) -> None:
+    """Per-segment totals of the shards crawled in this run"""
+
+    segments: Dict[str, Dict] = {}
+    for stats in shard_stats.values():
+        totals = segments.setdefault(stats["segment"], {"shards": 0, "listings": 0, "seconds": 0.0})
+        totals["shards"] += 1
+        totals["listings"] += stats["listings"]
+        totals["seconds"] += stats["seconds"]
+
+    for segment, totals in sorted(segments.items()):
+        print(
+            f"  {segment}: {totals['shards']} shards, {totals['listings']} listings, "
+            f"{totals['listings'] / max(totals['seconds'], 1e-6):.1f} listings/sec per shard"
+        )
+
+
+async def run(
+    shards: int = 1,
+    plan: Optional[CrawlPlan] = None,
+    seen_index_path: Optional[str] = DEFAULT_SEEN_INDEX_PATH,
+    spool_path: Optional[str] = None,
+    journal_path: str = DEFAULT_JOURNAL_PATH,
+    resume: bool = False,
+    cache_dir: Optional[str] = None,
+    parse_workers: int = 0,
+    dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH,
+    rejected_path: str = DEFAULT_REJECTED_PATH,
+    archive_dir: Optional[str] = None,
+    archive_compression: str = "gzip",
+    index_crawl: bool = False,
+):
+    """Crawl every shard of the plan, running up to `shards` at once under the shared throttle
+
+    The plan (states x property types x price bands) defaults to NSW established houses
+    in fixed $50k buckets. Shards are interleaved across segments, and every request
+    from every shard counts against the one throttle, so its max rate caps the crawl
+    as a whole. Listings already in the database or in the saved seen index are skipped. Parsed
+    listings are imported as they arrive, or appended to `spool_path` for a later import.
+
+    Progress is journaled to `journal_path`. With resume, the previous run's plan is reused,
+    finished ranges are skipped, partial ranges continue after their last settled page and
+    listings that failed are retried.
+
+    With cache_dir, every fetched body is kept in an on-disk response cache for replay.
+    With parse_workers, pages are parsed in that many worker processes so the event loop
+    only does networking. Urls that still fail after their retries are written to
+    `dead_letter_path`, and listings the import rejects to `rejected_path`. With
+    archive_dir, every parsed listing is also appended to a compressed NDJSON archive
+    partitioned by crawl date, which import_properties.py can replay into the database.
+
+    Known listings whose search card fingerprint changed since they were stored are
+    scraped again and updated. With index_crawl, changed listings are also refreshed
+    straight from their cards, and listings stored before fingerprints existed get one.
+    """
+
+    global response_cache, parse_executor
 
-async def run():
     try:
-        existing_data = {"properties": [], "completed_price_ranges": []}
+        if parse_workers > 0:
+            parse_executor = ProcessPoolExecutor(max_workers=parse_workers)
+
         db = SessionLocal()
+        started = time.monotonic()
+        if cache_dir:
+            response_cache = ResponseCache(cache_dir)
+
+        journal = CrawlJournal(journal_path, resume=resume)
+        seen_listings = SeenListingIndex(seen_index_path)
+        print(f"Loaded {seen_listings.load()} listing ids from the seen index")
+        print(f"Seeded {seen_listings.seed_from_db(db)} listing ids from the database")
+        seen_listings.update(journal.stored_ids)
+        journal.stored_ids.clear()
+
+        # Only compact state lives here for the whole crawl, never the scraped properties themselves
+        existing_data = {
+            "scraped_count": 0,
+            "completed_price_ranges": [],
+            "claimed_ids": set(),
+            "seen_listings": seen_listings,
+            "spool": SpoolWriter(spool_path) if spool_path else None,
+            "journal": journal,
+            "dead_letters": DeadLetterLog(dead_letter_path),
+            "writer": ImportWriter(SessionLocal, metrics=metrics, rejected_path=rejected_path),
+            "archive": ArchiveWriter(archive_dir, archive_compression) if archive_dir else None,
+            "index_crawl": index_crawl,
+            "card_fingerprints": {},
+            "refreshed_count": 0,
+            "shard_stats": {},
+        }
+
+        if journal.plan is not None:
+            crawl_shards = [CrawlShard.from_journal(entry) for entry in journal.plan]
+            print(f"Resuming: {len(journal.completed_ranges)} of {len(crawl_shards)} shards already complete")
+        else:
+            crawl_shards = await (plan or CrawlPlan()).shards(count_listings)
+            journal.record_plan(crawl_shards)
+
+        if resume:
+            await retry_failed_listings(existing_data)
+
+        pending = asyncio.Queue()
+        for shard in crawl_shards:
+            if shard.key not in journal.completed_ranges:
+                pending.put_nowait(shard)
+        existing_data["planned_shards"] = pending.qsize()
+
+        async def shard_worker():
+            while not pending.empty():
+                await process_price_range(pending.get_nowait(), existing_data)
+
+        await asyncio.gather(*[shard_worker() for _ in range(max(1, shards))])
+
+        total = existing_data["scraped_count"]
+        elapsed = time.monotonic() - started
+        print(f"\nFinished scraping all properties. Total properties: {total}")
+        if index_crawl:
+            print(f"Refreshed from search cards: {existing_data['refreshed_count']}")
+        print(f"Elapsed: {elapsed:.0f}s ({total / max(elapsed, 1e-6):.1f} listings/sec)")
+        print(f"Throttle: {throttle}")
+        print(f"Suburb insights: {suburb_insights}")
+        print(f"Import: {existing_data['writer']}")
+        print(f"Dead letters: {existing_data['dead_letters'].count} (see {dead_letter_path})")
+        print_shard_stats(existing_data["shard_stats"])
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        await client.aclose()
+        if "db" in locals():
+            db.close()
+        if "existing_data" in locals():
+            existing_data["writer"].close()
+            existing_data["journal"].close()
+            existing_data["dead_letters"].close()
+            if existing_data["spool"] is not None:
+                existing_data["spool"].close()
+            if existing_data["archive"] is not None:
+                existing_data["archive"].close()
+        if response_cache is not None:
+            response_cache.close()
+        if parse_executor is not None:
+            parse_executor.shutdown(cancel_futures=True)
+
+
+async def run_enqueue(plan: CrawlPlan) -> None:
+    """Add the plan's shards to the crawl job table for workers to claim"""
+
+    jobs = CrawlJobQueue(SessionLocal, "enqueue")
+    try:
+        crawl_shards = await plan.shards(count_listings)
+        added = await jobs.enqueue(crawl_shards)
+        print(f"Queued {added} of {len(crawl_shards)} shards ({len(crawl_shards) - added} were already queued)")
+        print(f"Jobs: {await jobs.counts()}")
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        await client.aclose()
+        jobs.close()
+
 
-        low_price = 0
-        for high_price in range(50000, 12000000, 50000):
-            await process_price_range(db, str(low_price), str(high_price), existing_data)
-            low_price = high_price
-            await asyncio.sleep(0.2)
+async def run_worker(
+    worker_id: str,
+    lease_seconds: int = DEFAULT_LEASE_SECONDS,
+    poll_interval: float = 30.0,
+    parse_workers: int = 0,
+    dead_letter_path: str = DEFAULT_DEAD_LETTER_PATH,
+    rejected_path: str = DEFAULT_REJECTED_PATH,
+):
+    """Claim shards from the crawl job table and crawl them until no work is left
 
-        print(f"\nFinished scraping all properties. Total properties: {len(existing_data['properties'])}")
+    Any number of workers, on any number of machines, can share one job table. Each
+    claimed shard is crawled with process_price_range while its lease is renewed in the
+    background. A shard whose lease is lost to another worker is abandoned, and one that
+    can't be finished goes back to the queue. The worker exits once no job is pending
+    or running, waiting `poll_interval` between claims while others still hold leases.
+    """
+
+    global parse_executor
+
+    try:
+        if parse_workers > 0:
+            parse_executor = ProcessPoolExecutor(max_workers=parse_workers)
+
+        db = SessionLocal()
+        started = time.monotonic()
+        jobs = CrawlJobQueue(SessionLocal, worker_id, lease_seconds)
+
+        # Workers only share state through the database, so there is no seen index file or journal
+        seen_listings = SeenListingIndex()
+        print(f"Seeded {seen_listings.seed_from_db(db)} listing ids from the database")
+
+        existing_data = {
+            "scraped_count": 0,
+            "completed_price_ranges": [],
+            "claimed_ids": set(),
+            "seen_listings": seen_listings,
+            "spool": None,
+            "journal": None,
+            "dead_letters": DeadLetterLog(dead_letter_path),
+            "writer": ImportWriter(SessionLocal, metrics=metrics, rejected_path=rejected_path),
+            "archive": None,
+            "card_fingerprints": {},
+            "shard_stats": {},
+        }
+
+        while True:
+            claimed = await jobs.claim()
+            if claimed is None:
+                counts = await jobs.counts()
+                if not counts.get("pending") and not counts.get("running"):
+                    break
+                await asyncio.sleep(poll_interval)
+                continue
+
+            job_id, shard = claimed
+            print(f"\n{worker_id} claimed job {job_id} ({shard.key})")
+            crawl = asyncio.create_task(process_price_range(shard, existing_data))
+            heartbeat = asyncio.create_task(jobs.keep_alive(job_id, crawl.cancel))
+            try:
+                finished = await crawl
+            except asyncio.CancelledError:
+                if not heartbeat.done():
+                    raise
+                continue  # lease lost, the job belongs to another worker now
+            except Exception as e:
+                print(f"Error crawling {shard.key}: {e}")
+                await jobs.release(job_id, str(e))
+                continue
+            finally:
+                heartbeat.cancel()
+
+            if finished:
+                await jobs.finish(job_id, existing_data["shard_stats"][shard.key]["listings"])
+            else:
+                await jobs.release(job_id, "shard was not paginated to the end")
+
+        total = existing_data["scraped_count"]
+        elapsed = time.monotonic() - started
+        print(f"\n{worker_id} found no more jobs. Total properties: {total}")
+        print(f"Elapsed: {elapsed:.0f}s ({total / max(elapsed, 1e-6):.1f} listings/sec)")
+        print(f"Throttle: {throttle}")
+        print(f"Suburb insights: {suburb_insights}")
+        print(f"Import: {existing_data['writer']}")
+        print_shard_stats(existing_data["shard_stats"])
 
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -238,7 +857,160 @@ async def run():
         await client.aclose()
         if "db" in locals():
             db.close()
+        if "jobs" in locals():
+            jobs.close()
+        if "existing_data" in locals():
+            existing_data["writer"].close()
+            existing_data["dead_letters"].close()
+        if parse_executor is not None:
+            parse_executor.shutdown(cancel_futures=True)
+
+
+async def report_metrics(crawl: Awaitable, metrics_path: Optional[str] = None, interval: float = 10.0) -> Any:
+    """Await a crawl while rewriting `metrics_path` every `interval` seconds, then print the summary
+
+    The file is JSON when the path ends in .json and Prometheus text otherwise.
+    """
+
+    reporter = asyncio.create_task(metrics.write_every(metrics_path, interval)) if metrics_path else None
+    try:
+        return await crawl
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+            metrics.write(metrics_path)
+        print(f"\nMetrics:\n{metrics.summary()}")
+
+
+async def run_replay(cache_dir: str, spool_path: Optional[str] = None):
+    """Offline run: parse and import (or spool) the pages held in a response cache"""
+
+    global response_cache
+
+    try:
+        response_cache = ResponseCache(cache_dir)
+        existing_data = {
+            "scraped_count": 0,
+            "claimed_ids": set(),
+            "seen_listings": SeenListingIndex(),
+            "spool": SpoolWriter(spool_path) if spool_path else None,
+            "journal": None,
+            "writer": ImportWriter(SessionLocal, metrics=metrics),
+        }
+
+        await replay_cache(existing_data)
+
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    finally:
+        await client.aclose()
+        if "existing_data" in locals():
+            existing_data["writer"].close()
+            if existing_data["spool"] is not None:
+                existing_data["spool"].close()
+        if response_cache is not None:
+            response_cache.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(run())
+    parser = argparse.ArgumentParser(description="Scrape Domain sale listings into the database")
+    parser.add_argument("--shards", type=int, default=1, help="number of shards to crawl concurrently")
+    parser.add_argument("--plan", help="JSON crawl plan of states, property types and price bands")
+    parser.add_argument("--states", nargs="+", help="states to crawl, or 'all' (overrides the plan)")
+    parser.add_argument("--property-types", nargs="+", help="property types to crawl (overrides the plan)")
+    parser.add_argument(
+        "--plan-ranges", action="store_true", help="size price ranges from propertyCounts instead of fixed $50k buckets"
+    )
+    parser.add_argument("--target-per-range", type=int, help="listings to aim for per planned range")
+    parser.add_argument("--max-rps", type=float, help="cap on request starts per second across all shards")
+    parser.add_argument(
+        "--seen-index", default=DEFAULT_SEEN_INDEX_PATH, help="file persisting the ids of already scraped listings"
+    )
+    parser.add_argument("--spool", help="append parsed listings to this NDJSON file instead of importing them")
+    parser.add_argument("--journal", default=DEFAULT_JOURNAL_PATH, help="append-only crawl progress journal")
+    parser.add_argument("--resume", action="store_true", help="continue the crawl recorded in the journal")
+    parser.add_argument("--cache", help="directory of the on-disk response cache")
+    parser.add_argument(
+        "--replay", action="store_true", help="parse and import the pages in --cache offline instead of crawling"
+    )
+    parser.add_argument(
+        "--parse-workers", type=int, default=0, help="worker processes for page parsing (0 parses on the event loop)"
+    )
+    parser.add_argument(
+        "--dead-letter", default=DEFAULT_DEAD_LETTER_PATH, help="file for urls that failed after all retries"
+    )
+    parser.add_argument(
+        "--rejected", default=DEFAULT_REJECTED_PATH, help="file for listings the import rejected, with the reason"
+    )
+    parser.add_argument("--archive", help="also append parsed listings to compressed NDJSON files in this directory")
+    parser.add_argument(
+        "--archive-compression", choices=sorted(ARCHIVE_SUFFIXES), default="gzip", help="compression for --archive"
+    )
+    parser.add_argument(
+        "--index-crawl",
+        action="store_true",
+        help="also refresh changed listings straight from their search cards, and fingerprint older ones",
+    )
+    parser.add_argument("--enqueue", action="store_true", help="add the plan's shards to the crawl job table and exit")
+    parser.add_argument("--worker", action="store_true", help="crawl shards claimed from the crawl job table")
+    parser.add_argument(
+        "--worker-id", default=f"{socket.gethostname()}-{os.getpid()}", help="name this worker's leases are held under"
+    )
+    parser.add_argument(
+        "--lease", type=int, default=DEFAULT_LEASE_SECONDS, help="seconds a claimed job stays leased between heartbeats"
+    )
+    parser.add_argument("--metrics", help="metrics file to keep updated, JSON for a .json path else Prometheus text")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between metrics file updates")
+    args = parser.parse_args()
+
+    if args.index_crawl and args.spool:
+        parser.error("--index-crawl updates the database directly and can't be used with --spool")
+
+    plan = CrawlPlan.load(args.plan) if args.plan else CrawlPlan()
+    if args.states:
+        try:
+            plan.states = resolve_states(args.states)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.property_types:
+        plan.property_types = args.property_types
+    if args.plan_ranges:
+        plan.plan_ranges = True
+    if args.target_per_range:
+        plan.target_per_range = args.target_per_range
+
+    if args.max_rps:
+        throttle.min_delay = throttle.delay = 1 / args.max_rps
+
+    if args.enqueue:
+        asyncio.run(run_enqueue(plan))
+    elif args.worker:
+        crawl = run_worker(
+            args.worker_id,
+            lease_seconds=args.lease,
+            parse_workers=args.parse_workers,
+            dead_letter_path=args.dead_letter,
+            rejected_path=args.rejected,
+        )
+        asyncio.run(report_metrics(crawl, args.metrics, args.metrics_interval))
+    elif args.replay:
+        if not args.cache:
+            parser.error("--replay needs --cache")
+        asyncio.run(report_metrics(run_replay(args.cache, spool_path=args.spool), args.metrics, args.metrics_interval))
+    else:
+        crawl = run(
+            shards=args.shards,
+            plan=plan,
+            seen_index_path=args.seen_index,
+            spool_path=args.spool,
+            journal_path=args.journal,
+            resume=args.resume,
+            cache_dir=args.cache,
+            parse_workers=args.parse_workers,
+            dead_letter_path=args.dead_letter,
+            rejected_path=args.rejected,
+            archive_dir=args.archive,
+            archive_compression=args.archive_compression,
+            index_crawl=args.index_crawl,
+        )
+        asyncio.run(report_metrics(crawl, args.metrics, args.metrics_interval))
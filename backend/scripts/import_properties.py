@@ -1,6 +1,10 @@
 import os
 import sys
-from typing import Dict
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Iterable, Iterator, List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
@@ -9,11 +13,74 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.models import Suburb, Property, School
 from app.services.property_import import property_import_service
+from app.services.property_copy import property_copy_loader
+from app.services.suburb_cache import suburb_cache
+from app.core.database import SessionLocal
+from crawl_spool import archive_partitions, read_spool
 
+DEFAULT_REJECTED_PATH = "rejected_listings.jsonl"
 
-async def import_properties(db: Session, data: Dict) -> None:
+
+class RejectedListings:
+    """JSON-lines file of the listings an import rejected, each with the reason
+
+    A line is the listing as it was handed to the importer plus an `importError` entry,
+    so once the cause is fixed the file can be imported again like a spool file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "a")
+
+    def record(self, property_data: Dict, reason: str) -> None:
+        self.count += 1
+        entry = {**property_data, "importError": {"reason": reason, "at": time.time()}}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def import_properties(db: Session, data: Dict, rejected: Optional[RejectedListings] = None) -> None:
     """Import properties into db from given dict"""
 
+    import_property_batch(db, data, rejected)
+
+
+def import_property_rows(db: Session, properties: List[Dict], errors: List[Dict]) -> None:
+    """Import listings one at a time, recording the ones that fail in `errors`
+
+    Each listing is written in a savepoint of its own, so a failure discards that
+    listing only and the chunk's transaction carries on with the next one.
+    """
+
+    for property_data in properties:
+        try:
+            # Import property with suburb_id
+            property_data["suburb_id"] = suburb_cache.resolve(db, property_data)
+            imported_property = property_import_service.create_property_with_relations(db, property_data)
+            if not imported_property:
+                raise ValueError("Failed to create/get property")
+
+        except Exception as e:
+            errors.append({"property_id": property_data.get("propertyId"), "error": str(e), "listing": property_data})
+            print(f"Error importing property {property_data.get('propertyId')}: {str(e)}")
+
+
+def import_property_batch(db: Session, data: Dict, rejected: Optional[RejectedListings] = None) -> Dict[int, str]:
+    """Import properties into db from given dict, blocking until committed
+
+    Suburbs are resolved first through the in-process suburb cache, then the chunk's
+    properties, schools and school links are written with a few bulk upserts. If the
+    bulk write fails (e.g. on a duplicate listing url) it is rolled back to a savepoint
+    and the chunk is imported row by row, so only the offending listings are lost.
+    Listings that fail are written to `rejected` with the reason once the chunk commits.
+    Returns the ids of the failed listings mapped to the reason, so the caller doesn't
+    count them as stored. Synchronous so it can run on the scraper's import writer thread.
+    """
+
     try:
         initial_counts = {
             "properties": db.query(Property).count(),
@@ -22,29 +89,36 @@ async def import_properties(db: Session, data: Dict) -> None:
         }
 
         errors = []
+        resolved = []
 
-        # Process each property
+        # Create or get each listing's suburb
         for property_data in data.get("properties", []):
             try:
-                # Create or get suburb
-                suburb = property_import_service.create_or_get_suburb(db, property_data)
-                if not suburb:
-                    raise ValueError("Failed to create/get suburb")
-
-                # Import property with suburb_id
-                property_data["suburb_id"] = suburb.id
-                imported_property = property_import_service.create_property_with_relations(db, property_data)
-                if not imported_property:
-                    raise ValueError("Failed to create/get property")
+                if not property_data.get("listingId"):
+                    raise ValueError("no listingId for property")
+                property_data["suburb_id"] = suburb_cache.resolve(db, property_data)
+                resolved.append(property_data)
 
             except Exception as e:
-                errors.append({"property_id": property_data.get("propertyId"), "error": str(e)})
+                errors.append(
+                    {"property_id": property_data.get("propertyId"), "error": str(e), "listing": property_data}
+                )
                 print(f"Error importing property {property_data.get('propertyId')}: {str(e)}")
-                continue
+
+        try:
+            with db.begin_nested():
+                property_import_service.bulk_import_properties(db, resolved)
+        except SQLAlchemyError as e:
+            print(f"Bulk import of {len(resolved)} properties failed, importing them one at a time: {e}")
+            import_property_rows(db, resolved, errors)
 
         # Final commit
         db.commit()
 
+        if rejected is not None:
+            for error in errors:
+                rejected.record(error["listing"], error["error"])
+
         final_counts = {
             "properties": db.query(Property).count(),
             "schools": db.query(School).count(),
@@ -56,12 +130,17 @@ async def import_properties(db: Session, data: Dict) -> None:
         print(f"Properties imported: {final_counts['properties'] - initial_counts['properties']}")
         print(f"Schools added: {final_counts['schools'] - initial_counts['schools']}")
         print(f"Errors encountered: {len(errors)}")
+        print(f"Suburb cache: {suburb_cache}")
 
         if errors:
             print("\nErrors:")
             for error in errors:
                 print(f"Property {error['property_id']}: {error['error']}")
 
+        return {
+            int(error["listing"]["listingId"]): error["error"] for error in errors if error["listing"].get("listingId")
+        }
+
     except SQLAlchemyError as e:
         print(f"Database error: {str(e)}")
         db.rollback()
@@ -72,3 +151,88 @@ async def import_properties(db: Session, data: Dict) -> None:
         raise
     finally:
         db.close()
+
+
+def import_card_summaries(db: Session, cards: List[Dict]) -> None:
+    """Refresh existing properties from search result cards, blocking until committed"""
+
+    try:
+        property_import_service.update_property_summaries(db, cards)
+        db.commit()
+    except Exception as e:
+        print(f"Error refreshing {len(cards)} property summaries: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def import_spool(
+    db: Session, path: str, chunk_size: int = 500, rejected: Optional[RejectedListings] = None
+) -> None:
+    """Import a scraper spool file chunk by chunk, never holding more than one chunk in memory"""
+
+    await import_listings(db, read_spool(path), chunk_size, rejected)
+
+
+async def import_listings(
+    db: Session, listings: Iterable[Dict], chunk_size: int = 500, rejected: Optional[RejectedListings] = None
+) -> int:
+    """Import a stream of listings chunk by chunk, returning how many were read"""
+
+    count = 0
+    chunk = []
+    for property_data in listings:
+        chunk.append(property_data)
+        if len(chunk) >= chunk_size:
+            await import_properties(db, {"properties": chunk}, rejected)
+            count += len(chunk)
+            chunk = []
+
+    if chunk:
+        await import_properties(db, {"properties": chunk}, rejected)
+        count += len(chunk)
+    return count
+
+
+def read_archive(paths: Iterable[str], since: Optional[str] = None, until: Optional[str] = None) -> Iterator[Dict]:
+    """Stream listings from spool and archive files, expanding directories into their date partitions"""
+
+    for path in paths:
+        partitions = archive_partitions(path, since, until) if os.path.isdir(path) else [path]
+        for partition in partitions:
+            print(f"Replaying {partition}")
+            yield from read_spool(partition)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import spool files or archives written by domain_properties_scraper --spool/--archive"
+    )
+    parser.add_argument("paths", nargs="+", help="NDJSON spool/archive files, or archive directories")
+    parser.add_argument("--chunk-size", type=int, default=500, help="listings per import transaction")
+    parser.add_argument("--since", help="first crawl date (YYYY-MM-DD) to replay from archive directories")
+    parser.add_argument("--until", help="last crawl date (YYYY-MM-DD) to replay from archive directories")
+    parser.add_argument(
+        "--copy", action="store_true", help="load everything in one transaction through COPY and staging tables"
+    )
+    parser.add_argument(
+        "--rejected", default=DEFAULT_REJECTED_PATH, help="file for listings the import rejected, with the reason"
+    )
+    args = parser.parse_args()
+
+    listings = read_archive(args.paths, args.since, args.until)
+    if args.copy:
+        db = SessionLocal()
+        try:
+            for name, count in property_copy_loader.load(db, listings).items():
+                print(f"{name}: {count}")
+        finally:
+            db.close()
+    else:
+        rejected = RejectedListings(args.rejected)
+        try:
+            count = asyncio.run(import_listings(SessionLocal(), listings, args.chunk_size, rejected))
+            print(f"Imported {count} listings, {rejected.count} rejected (see {args.rejected})")
+        finally:
+            rejected.close()
@@ -0,0 +1,120 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from crawl_metrics import CrawlMetrics
+from import_properties import RejectedListings, import_property_batch
+
+
+class ImportWriter:
+    """Imports chunks of parsed properties on a dedicated writer thread
+
+    The crawl keeps running while a chunk is written. `submit` waits, without blocking
+    the event loop, once `max_pending` chunks are queued, so a database that can't keep
+    up pushes back on the crawler instead of buffering without bound.
+
+    With `metrics`, each chunk's import time and the writer's backlog are reported there too.
+    With `rejected_path`, listings the import rejects are appended to that file with the reason.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_pending: int = 4,
+        metrics: Optional[CrawlMetrics] = None,
+        rejected_path: Optional[str] = None,
+    ):
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self.rejected = RejectedListings(rejected_path) if rejected_path else None
+        self.stats = {"chunks": 0, "properties": 0, "errors": 0, "import_seconds": 0.0}
+
+        self._session_factory = session_factory
+        self._db: Optional[Session] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import-writer")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._submitted_at: Dict[int, float] = {}
+        self._next_chunk = 0
+
+        if metrics is not None:
+            metrics.gauge("import_pending", lambda: self.pending)
+            metrics.gauge("import_lag_seconds", lambda: self.lag)
+
+    def _import(self, importer: Callable[[Session, List[Dict]], Any], items: List[Dict]) -> Any:
+        # Runs on the writer thread, which owns its session
+        if self._db is None:
+            self._db = self._session_factory()
+
+        started = time.monotonic()
+        try:
+            return importer(self._db, items)
+        finally:
+            elapsed = time.monotonic() - started
+            self.stats["import_seconds"] += elapsed
+            if self.metrics is not None:
+                self.metrics.observe("import_batch", elapsed)
+
+    def _import_properties(self, db: Session, properties: List[Dict]) -> Dict[int, str]:
+        return import_property_batch(db, {"properties": properties}, self.rejected)
+
+    async def submit(
+        self, items: List[Dict], importer: Optional[Callable[[Session, List[Dict]], Any]] = None
+    ) -> asyncio.Future:
+        """Queue a chunk for import, returning a future that resolves once it is committed
+
+        `importer` is called with the writer's session and the chunk, and defaults to
+        importing the chunk as full property records. The future resolves to what the
+        importer returns, for property records the listings it rejected with the reason.
+        """
+
+        await self._slots.acquire()
+
+        chunk = self._next_chunk
+        self._next_chunk += 1
+        self._submitted_at[chunk] = time.monotonic()
+
+        importer = importer or self._import_properties
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._import, importer, items)
+        future.add_done_callback(lambda done: self._finished(chunk, len(items), done))
+        return future
+
+    def _finished(self, chunk: int, count: int, future: asyncio.Future) -> None:
+        self._slots.release()
+        del self._submitted_at[chunk]
+
+        if future.cancelled() or future.exception() is not None:
+            self.stats["errors"] += 1
+        else:
+            self.stats["chunks"] += 1
+            self.stats["properties"] += count
+
+    @property
+    def pending(self) -> int:
+        """Chunks submitted but not yet committed"""
+        return len(self._submitted_at)
+
+    @property
+    def lag(self) -> float:
+        """Seconds the oldest uncommitted chunk has been waiting"""
+        if not self._submitted_at:
+            return 0.0
+        return time.monotonic() - min(self._submitted_at.values())
+
+    def close(self) -> None:
+        """Wait for queued chunks to finish, then release the writer's session"""
+
+        self._executor.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
+        if self.rejected is not None:
+            self.rejected.close()
+
+    def __str__(self) -> str:
+        batch_latency = self.stats["import_seconds"] / max(self.stats["chunks"] + self.stats["errors"], 1)
+        return (
+            f"writer pending={self.pending}/{self.max_pending} lag={self.lag:.1f}s "
+            f"imported={self.stats['properties']} batch={batch_latency:.2f}s errors={self.stats['errors']}"
+            + (f" rejected={self.rejected.count}" if self.rejected is not None else "")
+        )
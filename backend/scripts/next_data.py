@@ -0,0 +1,69 @@
+import json
+from typing import Any, Dict, Optional
+from parsel import Selector
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib decoder is used instead
+    orjson = None
+
+NEXT_DATA_ID = b"__NEXT_DATA__"
+
+
+def decode_json(payload: bytes) -> Any:
+    """Decode JSON with orjson when it is installed"""
+
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def extract_next_data(body: bytes) -> Optional[bytes]:
+    """Slice the __NEXT_DATA__ script payload straight out of the raw page bytes
+
+    Next.js escapes '<' inside the payload, so the first '</script>' after the tag is its end.
+    Returns None when the tag can't be located, leaving the caller to fall back to a DOM parse.
+    """
+
+    marker = body.find(NEXT_DATA_ID)
+    while marker != -1:
+        # The id must sit inside an opening <script ...> tag, not e.g. in inline js
+        tag_start = body.rfind(b"<script", 0, marker)
+        if tag_start != -1 and body.find(b">", tag_start, marker) == -1:
+            break
+        marker = body.find(NEXT_DATA_ID, marker + len(NEXT_DATA_ID))
+
+    if marker == -1:
+        return None
+
+    payload_start = body.find(b">", marker)
+    payload_end = body.find(b"</script>", payload_start)
+    if payload_start == -1 or payload_end == -1:
+        return None
+
+    return body[payload_start + 1 : payload_end]
+
+
+def select_next_data(text: str) -> Dict:
+    """Locate and decode __NEXT_DATA__ with a full selector parse of the page"""
+
+    selector = Selector(text)
+    script = selector.xpath("//script[@id='__NEXT_DATA__']/text()").get()
+
+    if not script:
+        raise ValueError("Could not find __NEXT_DATA__ script tag")
+
+    return json.loads(script)
+
+
+def load_next_data(body: bytes, text: Optional[str] = None) -> Dict:
+    """Decode the __NEXT_DATA__ JSON of a page, only building a DOM when the byte scan fails"""
+
+    payload = extract_next_data(body)
+    if payload is not None:
+        try:
+            return decode_json(payload)
+        except ValueError:
+            pass
+
+    return select_next_data(text if text is not None else body.decode("utf-8", errors="replace"))
@@ -0,0 +1,71 @@
+import asyncio
+from typing import Awaitable, Callable, List, Tuple
+
+# Domain only serves this many search pages for a query, listings past that are unreachable
+MAX_SEARCH_PAGES = 50
+PROPERTIES_PER_PAGE = 20
+MAX_RESULTS_PER_RANGE = MAX_SEARCH_PAGES * PROPERTIES_PER_PAGE
+
+# (low price, high price, listing count)
+PriceRange = Tuple[int, int, int]
+CountListings = Callable[[int, int], Awaitable[int]]
+
+
+def split_price(low_price: int, high_price: int, min_width: int) -> int:
+    """Midpoint of a price range, rounded down to a multiple of min_width"""
+
+    mid = low_price + ((high_price - low_price) // 2 // min_width) * min_width
+    return max(mid, low_price + min_width)
+
+
+def merge_sparse_ranges(ranges: List[PriceRange], target: int) -> List[PriceRange]:
+    """Merge neighbouring ranges while their combined count stays within target"""
+
+    merged: List[PriceRange] = []
+    for low_price, high_price, count in sorted(ranges):
+        if merged and merged[-1][2] + count <= target:
+            previous_low, _, previous_count = merged[-1]
+            merged[-1] = (previous_low, high_price, previous_count + count)
+        else:
+            merged.append((low_price, high_price, count))
+
+    return merged
+
+
+async def plan_price_ranges(
+    count_listings: CountListings,
+    min_price: int = 0,
+    max_price: int = 12000000,
+    target: int = 800,
+    min_width: int = 1000,
+) -> List[PriceRange]:
+    """Split a price span into ranges holding roughly `target` listings each
+
+    Dense ranges are bisected until they fit, then sparse neighbours are merged, so
+    every range pages through few search pages and none hits the pagination cap.
+    `count_listings` returns the total from the first search page of a range.
+    """
+
+    async def split(low_price: int, high_price: int, count: int) -> List[PriceRange]:
+        if count <= target or high_price - low_price <= min_width:
+            if count > MAX_RESULTS_PER_RANGE:
+                print(
+                    f"Range ${low_price} - ${high_price} holds {count} listings but can't be split further, "
+                    f"only the first {MAX_RESULTS_PER_RANGE} are reachable"
+                )
+            return [(low_price, high_price, count)]
+
+        mid_price = split_price(low_price, high_price, min_width)
+        low_count, high_count = await asyncio.gather(
+            count_listings(low_price, mid_price), count_listings(mid_price, high_price)
+        )
+        low_ranges, high_ranges = await asyncio.gather(
+            split(low_price, mid_price, low_count), split(mid_price, high_price, high_count)
+        )
+        return low_ranges + high_ranges
+
+    total = await count_listings(min_price, max_price)
+    ranges = merge_sparse_ranges(await split(min_price, max_price, total), target)
+
+    print(f"Planned {len(ranges)} price ranges for {total} listings (target {target} per range)")
+    return ranges
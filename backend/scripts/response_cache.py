@@ -0,0 +1,111 @@
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+from typing import Dict, Iterator, Optional, Tuple
+from httpx import Request, Response
+
+
+class ResponseCache:
+    """On-disk cache of response bodies, gzip-compressed and content-addressed
+
+    Bodies are stored once per distinct content under objects/<sha256>.gz. An sqlite
+    index maps (url, fetch time) to the body digest, along with any ETag/Last-Modified
+    validators the server sent so the next fetch of that url can be conditional.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+
+        self._index = sqlite3.connect(os.path.join(directory, "index.sqlite"))
+        self._index.execute("PRAGMA journal_mode=WAL")
+        self._index.execute("PRAGMA synchronous=NORMAL")
+        self._index.execute(
+            """CREATE TABLE IF NOT EXISTS response (
+                url TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                PRIMARY KEY (url, fetched_at)
+            )"""
+        )
+        self._index.commit()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", f"{digest}.gz")
+
+    def _record(self, url: str, digest: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        self._index.execute(
+            "INSERT OR REPLACE INTO response (url, fetched_at, digest, etag, last_modified) VALUES (?, ?, ?, ?, ?)",
+            (url, time.time(), digest, etag, last_modified),
+        )
+        self._index.commit()
+
+    def store(self, url: str, response: Response) -> str:
+        """Save a 200 response body and index it under the url and current time"""
+
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(gzip.compress(body, compresslevel=6))
+            os.replace(tmp_path, path)
+
+        self._record(url, digest, response.headers.get("etag"), response.headers.get("last-modified"))
+        return digest
+
+    def latest(self, url: str) -> Optional[Dict]:
+        """Most recent index entry for a url"""
+
+        row = self._index.execute(
+            "SELECT digest, etag, last_modified FROM response WHERE url = ? ORDER BY fetched_at DESC LIMIT 1", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        return {"url": url, "digest": row[0], "etag": row[1], "last_modified": row[2]}
+
+    def validators(self, entry: Optional[Dict]) -> Dict[str, str]:
+        """Conditional request headers for revalidating a cached entry"""
+
+        headers = {}
+        if entry and entry["etag"]:
+            headers["if-none-match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["if-modified-since"] = entry["last_modified"]
+        return headers
+
+    def revalidated(self, entry: Dict) -> Response:
+        """Record a 304 for a cached entry and rebuild the full response from disk"""
+
+        self._record(entry["url"], entry["digest"], entry["etag"], entry["last_modified"])
+        return Response(200, content=self.load_body(entry["digest"]), request=Request("GET", entry["url"]))
+
+    def load_body(self, digest: str) -> bytes:
+        with open(self._object_path(digest), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def iter_latest(self) -> Iterator[Tuple[str, bytes]]:
+        """Yield (url, body) for the most recent fetch of every cached url, in url order
+
+        An entry whose body file is gone is skipped with a warning instead of ending the replay.
+        """
+
+        # SQLite returns the row holding MAX() for the bare columns of an aggregate query
+        rows = self._index.execute("SELECT url, digest, MAX(fetched_at) FROM response GROUP BY url ORDER BY url")
+        for url, digest, _ in rows:
+            try:
+                body = self.load_body(digest)
+            except FileNotFoundError:
+                print(f"Skipping {url}, its cached body {digest} is missing")
+                continue
+            yield url, body
+
+    def close(self) -> None:
+        self._index.close()
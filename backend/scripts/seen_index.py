@@ -0,0 +1,98 @@
+import os
+import sys
+from array import array
+from typing import Dict, Iterable, Optional, Set
+from sqlalchemy.orm import Session
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Property
+
+
+class SeenListingIndex:
+    """Listing ids that are already scraped, with O(1) membership checks
+
+    On disk the index is a sorted array of int64 ids (8 bytes per listing), so a
+    restarted crawl can load it in one read and skip known listings straight away.
+    The search card fingerprint last stored for each listing is kept alongside, in
+    `<path>.fingerprints` as sorted (id, fingerprint) int64 pairs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._ids: Set[int] = set()
+        self._fingerprints: Dict[int, int] = {}
+
+    def __contains__(self, listing_id) -> bool:
+        return int(listing_id) in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, listing_id) -> None:
+        self._ids.add(int(listing_id))
+
+    def update(self, listing_ids: Iterable) -> None:
+        self._ids.update(int(listing_id) for listing_id in listing_ids)
+
+    def fingerprint(self, listing_id) -> Optional[int]:
+        """Card fingerprint stored for a listing, None if it was never recorded"""
+        return self._fingerprints.get(int(listing_id))
+
+    def update_fingerprints(self, fingerprints: Dict[int, int]) -> None:
+        """Mark listings as seen along with their current card fingerprints"""
+
+        self._fingerprints.update(fingerprints)
+        self._ids.update(fingerprints)
+
+    def seed_from_db(self, db: Session) -> int:
+        """Add every listing id already in the property table, with its stored card fingerprint"""
+
+        before = len(self._ids)
+        for listing_id, fingerprint in db.query(Property.id, Property.fingerprint).yield_per(10000):
+            self._ids.add(listing_id)
+            if fingerprint is not None:
+                self._fingerprints[listing_id] = fingerprint
+        return len(self._ids) - before
+
+    def load(self) -> int:
+        """Add the ids saved at `path`, if the file exists"""
+
+        if not self.path or not os.path.exists(self.path):
+            return 0
+
+        ids = array("q")
+        with open(self.path, "rb") as f:
+            ids.frombytes(f.read())
+
+        before = len(self._ids)
+        self._ids.update(ids)
+
+        fingerprints_path = f"{self.path}.fingerprints"
+        if os.path.exists(fingerprints_path):
+            pairs = array("q")
+            with open(fingerprints_path, "rb") as f:
+                pairs.frombytes(f.read())
+            self._fingerprints.update(zip(pairs[::2], pairs[1::2]))
+
+        return len(self._ids) - before
+
+    def save(self) -> None:
+        """Write the index to `path`, replacing the previous file atomically"""
+
+        if not self.path:
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            array("q", sorted(self._ids)).tofile(f)
+        os.replace(tmp_path, self.path)
+
+        fingerprints_path = f"{self.path}.fingerprints"
+        tmp_path = f"{fingerprints_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pairs = array("q")
+            for listing_id in sorted(self._fingerprints):
+                pairs.extend((listing_id, self._fingerprints[listing_id]))
+            pairs.tofile(f)
+        os.replace(tmp_path, fingerprints_path)
@@ -0,0 +1,57 @@
+from typing import Dict, Optional, Tuple
+
+from domain_parsing import stable_hash
+
+
+def suburb_key(property_data: Dict) -> Optional[str]:
+    """Key of the suburb a listing is in, the (name, postcode) pair suburbs are stored under"""
+
+    suburb_name = property_data.get("suburb")
+    suburb_postcode = property_data.get("postcode")
+    if not suburb_name or not suburb_postcode:
+        return None
+    return f"{suburb_name}|{suburb_postcode}"
+
+
+class SuburbInsightsInterner:
+    """One shared copy of each suburb's suburbInsights block
+
+    Every detail page repeats its suburb's full insights (demographics, salesGrowthList,
+    ...). Interned listings point at a single canonical dict per suburb instead of a copy
+    each, and carry its hash as `suburbInsightsHash`, so spool writers and the importer
+    can tell a repeat from a changed payload without comparing the blocks.
+    """
+
+    def __init__(self):
+        self._insights: Dict[str, Tuple[int, Dict]] = {}
+        self.changed = 0
+
+    def __len__(self) -> int:
+        return len(self._insights)
+
+    def intern(self, property_data: Dict) -> Dict:
+        """Swap the listing's suburbInsights for the canonical copy, returning the listing"""
+
+        key = suburb_key(property_data)
+        insights = property_data.get("suburbInsights")
+        if key is None or not insights:
+            return property_data
+
+        insights_hash = property_data.get("suburbInsightsHash")
+        if insights_hash is None:
+            insights_hash = stable_hash(insights)
+
+        known = self._insights.get(key)
+        if known is not None and known[0] == insights_hash:
+            insights = known[1]
+        else:
+            if known is not None:
+                self.changed += 1
+            self._insights[key] = (insights_hash, insights)
+
+        property_data["suburbInsights"] = insights
+        property_data["suburbInsightsHash"] = insights_hash
+        return property_data
+
+    def __str__(self) -> str:
+        return f"suburbs={len(self)} changed={self.changed}"
@@ -10,8 +10,8 @@ from sqlalchemy_utils import database_exists, create_database, drop_database
 # Set testing environment
 os.environ["TESTING"] = "1"
 
-# Import after setting TESTING environment
-from app.main import app
+# Import after setting TESTING environment. The API app is imported by the fixtures that
+# need it, so database tests don't depend on every route module importing cleanly.
 from app.core.database import get_db
 from app.core.config import settings
 from app.models.base import Base
@@ -51,12 +51,20 @@ def test_engine():
 
 @pytest.fixture(scope="function")
 def db_session(test_engine) -> Generator[Session, None, None]:
-    """Create a fresh database session for a test."""
-    connection = test_engine.connect()
+    """Create a fresh database session for a test.
+
+    The session runs inside a real transaction that is rolled back afterwards. The engine
+    is in AUTOCOMMIT, where Postgres rejects SAVEPOINT, so this connection opts out of it.
+    Session commits and rollbacks act on a savepoint of that transaction, the way they
+    would on their own transaction outside the tests.
+    """
+    connection = test_engine.connect().execution_options(isolation_level="READ COMMITTED")
     transaction = connection.begin()
 
     # Create session bound to the connection
-    TestingSessionLocal = sessionmaker(bind=connection, expire_on_commit=False)
+    TestingSessionLocal = sessionmaker(
+        bind=connection, expire_on_commit=False, join_transaction_mode="create_savepoint"
+    )
     session = TestingSessionLocal()
 
     try:
@@ -70,6 +78,8 @@ def db_session(test_engine) -> Generator[Session, None, None]:
 @pytest.fixture(scope="module")
 def client() -> Generator[TestClient, None, None]:
     """Create a FastAPI TestClient."""
+    from app.main import app
+
     with TestClient(app) as test_client:
         yield test_client
 
@@ -80,6 +90,7 @@ def override_get_db(db_session: Session) -> Generator[None, None, None]:
     Override the get_db dependency for testing.
     This ensures tests use the test database session.
     """
+    from app.main import app
 
     def override_db():
         try:
@@ -0,0 +1,41 @@
+from app.services.crawl_job import crawl_job_service
+from app.models import CrawlJob
+
+
+def test_crawl_job_claims_and_lease_expiry(db_session):
+    """Workers claim distinct shards, and a shard whose lease lapsed is claimed again"""
+    db_session.query(CrawlJob).delete()
+    db_session.commit()
+
+    shards = [
+        {
+            "shard_key": f"nsw/house:{low}-{low + 50000}",
+            "state": "nsw",
+            "property_type": "house",
+            "established_type": "established",
+            "low_price": low,
+            "high_price": low + 50000,
+        }
+        for low in (0, 50000)
+    ]
+    assert crawl_job_service.enqueue(db_session, shards) == 2
+    assert crawl_job_service.enqueue(db_session, shards) == 0
+
+    first = crawl_job_service.claim(db_session, "worker-a", lease_seconds=60)
+    # A negative lease has already expired, as if worker-b died right after claiming
+    second = crawl_job_service.claim(db_session, "worker-b", lease_seconds=-1)
+    assert {first.shard_key, second.shard_key} == {shard["shard_key"] for shard in shards}
+
+    # The expired job is the only one up for grabs
+    reclaimed = crawl_job_service.claim(db_session, "worker-c", lease_seconds=60)
+    assert reclaimed.id == second.id
+    assert reclaimed.attempts == 2
+    assert crawl_job_service.claim(db_session, "worker-c", lease_seconds=60) is None
+
+    # worker-b lost its lease, so its heartbeats and results are rejected
+    assert not crawl_job_service.heartbeat(db_session, second.id, "worker-b", 60)
+    assert not crawl_job_service.finish(db_session, second.id, "worker-b", 10)
+    assert crawl_job_service.finish(db_session, second.id, "worker-c", 10)
+
+    assert crawl_job_service.release(db_session, first.id, "worker-a", "shard was not paginated to the end")
+    assert crawl_job_service.counts(db_session) == {"done": 1, "pending": 1}
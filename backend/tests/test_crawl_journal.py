@@ -0,0 +1,62 @@
+import os
+import sys
+
+# The crawl scripts import each other as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from crawl_journal import CrawlJournal, RangeProgress
+from crawl_plan import CrawlShard, SearchSegment
+
+
+def test_page_mark_stops_at_highest_fully_settled_page(tmp_path):
+    """Resume starts after the last page whose listings all settled, not the last page fetched"""
+    path = str(tmp_path / "journal.jsonl")
+    shard = "nsw/house:0-50000"
+
+    journal = CrawlJournal(path)
+    progress = RangeProgress(journal, shard)
+    progress.page_queued(1, 2)
+    progress.page_queued(2, 1)
+    progress.page_queued(3, 1)
+
+    # Later pages finishing first don't move the mark
+    progress.listing_settled(3)
+    progress.listing_settled(1)
+    assert progress.last_page == 0
+
+    progress.listing_failed(1, 101, "https://example.com/101", "gone")
+    assert progress.last_page == 1
+    journal.close()
+
+    # Page 2 still had a listing in flight when the crawl stopped
+    resumed = CrawlJournal(path, resume=True)
+    assert resumed.last_pages[shard] == 1
+    assert 101 in resumed.failed
+
+    # Picking up from page 2, settling it also covers the already settled page 3
+    progress = RangeProgress(resumed, shard, start_page=resumed.last_pages[shard] + 1)
+    progress.page_queued(2, 1)
+    progress.page_queued(3, 0)
+    progress.listing_settled(2)
+    assert progress.last_page == 3
+    resumed.close()
+
+    assert CrawlJournal(path, resume=True).last_pages[shard] == 3
+
+
+def test_plan_round_trips_through_the_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    shards = [
+        CrawlShard(SearchSegment("nsw", "house"), "0", "50000"),
+        CrawlShard(SearchSegment("vic", "townhouse"), "50000", "100000"),
+    ]
+
+    journal = CrawlJournal(path)
+    journal.record_plan(shards)
+    journal.record_range(shards[0].key)
+    journal.close()
+
+    resumed = CrawlJournal(path, resume=True)
+    assert [CrawlShard.from_journal(entry) for entry in resumed.plan] == shards
+    assert resumed.completed_ranges == {shards[0].key}
+    resumed.close()
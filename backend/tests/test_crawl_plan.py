@@ -0,0 +1,49 @@
+import os
+import sys
+import asyncio
+import pytest
+
+# The crawl scripts import each other as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from crawl_plan import AUSTRALIAN_STATES, CrawlPlan, CrawlShard, SearchSegment, resolve_states
+
+
+def test_resolve_states():
+    assert resolve_states(["NSW", "vic"]) == ["nsw", "vic"]
+    assert resolve_states(["all"]) == list(AUSTRALIAN_STATES)
+    assert resolve_states(["ALL", "nsw"]) == list(AUSTRALIAN_STATES)
+
+    with pytest.raises(ValueError, match="Unknown states xyz"):
+        resolve_states(["nsw", "xyz"])
+
+
+def test_shards_are_interleaved_across_segments():
+    """Concurrent shards spread over segments instead of working through one segment at a time"""
+
+    async def count_listings(segment, low_price, high_price):
+        # Listings spread evenly over the prices, Victoria twice as dense
+        per_thousand = 32 if segment.state == "vic" else 16
+        return (high_price - low_price) * per_thousand // 1000
+
+    plan = CrawlPlan(states=["nsw", "vic"], max_price=100000, plan_ranges=True, target_per_range=800)
+    shards = asyncio.run(plan.shards(count_listings))
+
+    nsw, vic = SearchSegment("nsw"), SearchSegment("vic")
+    assert [shard.segment for shard in shards][:2] == [nsw, vic]
+    assert sum(shard.segment == nsw for shard in shards) < sum(shard.segment == vic for shard in shards)
+
+    # Every segment is covered from min_price to max_price without gaps
+    for segment in (nsw, vic):
+        bands = [(int(shard.low_price), int(shard.high_price)) for shard in shards if shard.segment == segment]
+        assert bands[0][0] == 0 and bands[-1][1] == 100000
+        assert all(previous[1] == band[0] for previous, band in zip(bands, bands[1:]))
+
+
+def test_fixed_bands_round_robin_across_segments():
+    plan = CrawlPlan(states=["nsw", "qld"], property_types=["house", "townhouse"], max_price=150001)
+    shards = asyncio.run(plan.shards())
+
+    assert [str(shard.segment) for shard in shards[:4]] == ["nsw/house", "nsw/townhouse", "qld/house", "qld/townhouse"]
+    assert shards[4] == CrawlShard(SearchSegment("nsw", "house"), "50000", "100000")
+    assert len(shards) == 4 * 3
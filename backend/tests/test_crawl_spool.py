@@ -0,0 +1,97 @@
+import os
+import sys
+
+# The crawl scripts import each other as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from crawl_spool import ArchiveWriter, SpoolWriter, archive_partitions, read_spool
+from suburb_insights import SuburbInsightsInterner
+
+
+def make_listing(listing_id: int, suburb: str, median_price: int) -> dict:
+    insights = {"medianPrice": median_price, "demographics": {"population": 50000, "owners": 60.0}}
+    return {"listingId": listing_id, "suburb": suburb, "postcode": "2000", "suburbInsights": insights}
+
+
+def test_interned_insights_round_trip_through_the_spool(tmp_path):
+    """Each suburb's insights are written once, every listing reads them back, and a change is written again"""
+    path = str(tmp_path / "spool.ndjson")
+    interner = SuburbInsightsInterner()
+
+    listings = [
+        interner.intern(make_listing(1, "Newtown", 1500000)),
+        interner.intern(make_listing(2, "Newtown", 1500000)),
+        interner.intern(make_listing(3, "Glebe", 1800000)),
+        interner.intern(make_listing(4, "Newtown", 1500000)),
+    ]
+    assert listings[0]["suburbInsights"] is listings[1]["suburbInsights"]
+    assert len(interner) == 2
+
+    spool = SpoolWriter(path)
+    spool.write(listings[:2])
+    spool.write(listings[2:])
+    # Newtown's insights changed, so the new payload is written in full
+    spool.write([interner.intern(make_listing(5, "Newtown", 1550000))])
+    spool.close()
+    assert interner.changed == 1
+
+    with open(path) as f:
+        assert sum('"suburbInsights"' in line for line in f) == 3
+
+    replayed = list(read_spool(path))
+    assert [listing["listingId"] for listing in replayed] == [1, 2, 3, 4, 5]
+    assert [listing["suburbInsights"]["medianPrice"] for listing in replayed] == [
+        1500000,
+        1500000,
+        1800000,
+        1500000,
+        1550000,
+    ]
+    assert replayed[0]["suburbInsights"] is replayed[3]["suburbInsights"]
+    assert replayed[0]["suburbInsightsHash"] == listings[0]["suburbInsightsHash"]
+
+
+def test_spool_skips_line_torn_by_a_crash(tmp_path):
+    """A half-written last line is skipped on replay, and appending after it loses nothing else"""
+    path = str(tmp_path / "spool.ndjson")
+
+    spool = SpoolWriter(path)
+    spool.write([{"listingId": 1}, {"listingId": 2}])
+    spool.close()
+    with open(path, "ab") as f:
+        f.write(b'{"listingId": 3, "pri')
+
+    assert [listing["listingId"] for listing in read_spool(path)] == [1, 2]
+
+    # A resumed crawl appends to the same spool
+    spool = SpoolWriter(path)
+    spool.write([{"listingId": 4}])
+    spool.close()
+
+    assert [listing["listingId"] for listing in read_spool(path)] == [1, 2, 4]
+
+
+def test_archive_run_survives_an_earlier_torn_partition(tmp_path):
+    """A crashed run's truncated archive is read up to the break, and the next run writes its own file"""
+    directory = str(tmp_path)
+
+    archive = ArchiveWriter(directory)
+    archive.run_id = "120000-100"
+    archive.write([{"listingId": i} for i in range(2000)])
+    archive.close()
+    with open(archive.path, "rb") as f:
+        data = f.read()
+    with open(archive.path, "wb") as f:
+        f.write(data[: len(data) // 2])
+
+    archive = ArchiveWriter(directory)
+    archive.run_id = "130000-200"
+    archive.write([{"listingId": 5000}])
+    archive.close()
+
+    partitions = archive_partitions(directory)
+    assert len(partitions) == 2
+
+    torn = [listing["listingId"] for listing in read_spool(partitions[0])]
+    assert 0 < len(torn) < 2000 and torn == list(range(len(torn)))
+    assert [listing["listingId"] for listing in read_spool(partitions[1])] == [5000]
@@ -0,0 +1,86 @@
+import os
+import sys
+from typing import Tuple
+
+# The crawl scripts import each other as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import crawl_throttle
+from crawl_throttle import AdaptiveThrottle
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_throttle(monkeypatch, **kwargs) -> Tuple[AdaptiveThrottle, FakeClock]:
+    clock = FakeClock()
+    monkeypatch.setattr(crawl_throttle.time, "monotonic", clock)
+    return AdaptiveThrottle(**kwargs), clock
+
+
+def test_additive_increase_per_window_of_healthy_responses(monkeypatch):
+    throttle, _ = make_throttle(monkeypatch, initial_concurrency=4, target_latency=1.0)
+    throttle.delay = 0.4
+
+    for _ in range(3):
+        throttle.record(0.05, 200)
+    assert throttle.limit == 4
+
+    throttle.record(0.05, 200)
+    assert throttle.limit == 5
+    assert throttle.delay == 0.2
+
+
+def test_multiplicative_decrease_and_delay_only_on_repeated_pushback(monkeypatch):
+    throttle, clock = make_throttle(monkeypatch, initial_concurrency=16, target_latency=1.0)
+    throttle.record(0.03, 200)
+
+    # A lone 503 halves concurrency but leaves request pacing alone
+    throttle.record(0.03, 503)
+    assert throttle.limit == 8
+    assert throttle.delay == 0.0
+
+    # Pushback that persists past the cooldown starts spacing requests out
+    clock.now += 1.5
+    throttle.record(0.03, 503)
+    assert throttle.limit == 4
+    assert throttle.delay == 0.25
+
+    # Recovering a window clears the backoff, so the next lone 503 doesn't add delay again
+    for _ in range(4):
+        throttle.record(0.03, 200)
+    assert throttle.limit == 5
+    clock.now += 1.5
+    throttle.record(0.03, 503)
+    assert throttle.delay == 0.125
+
+
+def test_decrease_cooldown_is_at_least_target_latency(monkeypatch):
+    throttle, clock = make_throttle(monkeypatch, initial_concurrency=32, target_latency=2.0)
+    throttle.record(0.03, 200)
+
+    # The latency EWMA is 30ms, errors within target_latency of the last cut count once
+    throttle.record(0.03, 503)
+    for _ in range(10):
+        clock.now += 0.15
+        throttle.record(0.03, 503)
+    assert throttle.limit == 16
+    assert throttle.stats["throttled"] == 11
+
+    clock.now += 0.6
+    throttle.record(0.03, 503)
+    assert throttle.limit == 8
+
+
+def test_slow_responses_decrease_without_backoff(monkeypatch):
+    throttle, _ = make_throttle(monkeypatch, initial_concurrency=10, target_latency=0.5)
+
+    throttle.record(3.0, 200)
+    assert throttle.limit == 5
+    assert throttle.delay == 0.0
+    assert throttle.stats["slow"] == 1
@@ -0,0 +1,37 @@
+import os
+import pytest
+from scripts.next_data import extract_next_data, load_next_data, select_next_data
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+
+@pytest.mark.parametrize("fixture", ["search_page.html", "detail_page.html"])
+def test_fast_path_matches_selector(fixture):
+    """Byte-level extraction decodes to the same data as the selector parse"""
+    with open(os.path.join(FIXTURES_DIR, fixture), "rb") as f:
+        body = f.read()
+
+    assert extract_next_data(body) is not None
+    assert load_next_data(body) == select_next_data(body.decode("utf-8"))
+
+
+def test_extract_skips_inline_script_references():
+    """Mentions of __NEXT_DATA__ outside the tag's attributes are ignored"""
+    body = (
+        b"<script>window.__NEXT_DATA__ = window.__NEXT_DATA__ || {};</script>"
+        b'<script id="__NEXT_DATA__" type="application/json">{"a": 1}</script>'
+    )
+    assert extract_next_data(body) == b'{"a": 1}'
+
+
+def test_falls_back_to_selector():
+    """Markup the byte scan doesn't recognise is still parsed through the selector"""
+    body = b'<html><body><SCRIPT id="__NEXT_DATA__" type="application/json">{"a": 1}</SCRIPT></body></html>'
+
+    assert extract_next_data(body) is None
+    assert load_next_data(body) == {"a": 1}
+
+
+def test_missing_tag_raises():
+    with pytest.raises(ValueError, match="Could not find __NEXT_DATA__"):
+        load_next_data(b"<html><body>No data here</body></html>")
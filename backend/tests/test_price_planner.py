@@ -0,0 +1,40 @@
+import asyncio
+from scripts.price_planner import merge_sparse_ranges, plan_price_ranges, split_price
+
+
+def make_counter(prices):
+    """Fake count_listings backed by a list of listing prices"""
+
+    calls = []
+
+    async def count_listings(low_price: int, high_price: int) -> int:
+        calls.append((low_price, high_price))
+        return sum(1 for price in prices if low_price <= price < high_price)
+
+    return count_listings, calls
+
+
+def test_split_price_rounds_to_min_width():
+    assert split_price(0, 100000, 1000) == 50000
+    assert split_price(0, 1500, 1000) == 1000
+
+
+def test_merge_sparse_ranges():
+    ranges = [(0, 10, 5), (10, 20, 5), (20, 30, 9), (30, 40, 1)]
+    assert merge_sparse_ranges(ranges, target=10) == [(0, 20, 10), (20, 40, 10)]
+
+
+def test_plan_price_ranges_bisects_dense_and_merges_sparse():
+    # A few cheap listings, and a dense cluster around $1-2M
+    prices = [100000, 250000] + [1000000 + i * 1000 for i in range(1000)]
+    count_listings, calls = make_counter(prices)
+
+    ranges = asyncio.run(plan_price_ranges(count_listings, max_price=4000000, target=300))
+
+    assert all(count <= 300 for _, _, count in ranges)
+    assert sum(count for _, _, count in ranges) == len(prices)
+    # Ranges are contiguous over the whole span
+    assert ranges[0][0] == 0 and ranges[-1][1] == 4000000
+    assert all(ranges[i][1] == ranges[i + 1][0] for i in range(len(ranges) - 1))
+    # The sparse cheap end is merged into one range rather than one per bisection
+    assert ranges[0][2] >= 2
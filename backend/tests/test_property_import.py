@@ -0,0 +1,388 @@
+import os
+import sys
+import json
+from sqlalchemy import event, select
+from app.services.property_import import property_import_service
+from app.services.property_copy import property_copy_loader
+from app.services.suburb_cache import SuburbCache
+from app.models import Property, School, Suburb
+from app.models.property import property_school
+from scripts.seen_index import SeenListingIndex
+
+# The crawl scripts import each other as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from import_properties import RejectedListings, import_property_batch
+
+
+def create_test_suburb(db_session) -> Suburb:
+    """Helper function to create a test suburb"""
+    suburb = Suburb(
+        name="Test Suburb",
+        postcode="2000",
+        state="NSW",
+        suburb_profile_url="https://example.com/test-suburb",
+        population=50000,
+        median_price=1500000.0,
+        sales_growth={},
+    )
+    db_session.add(suburb)
+    db_session.flush()
+    return suburb
+
+
+def create_test_listing(suburb_id: int, listing_id: int, **fields) -> dict:
+    """Helper function to create raw listing data as the scraper stores it"""
+    return {
+        "listingId": listing_id,
+        "listingUrl": f"https://example.com/{listing_id}",
+        "suburb_id": suburb_id,
+        "features": [],
+        "structuredFeatures": [],
+        **fields,
+    }
+
+
+def cleanup_database(db_session):
+    """Helper function to clean up the database"""
+    db_session.execute(property_school.delete())
+    db_session.query(School).delete()
+    db_session.query(Property).delete()
+    db_session.query(Suburb).delete()
+    db_session.commit()
+
+
+def test_property_import_updates_changed_fingerprint(db_session):
+    """Re-importing a listing only overwrites it when its card fingerprint changed"""
+    cleanup_database(db_session)
+
+    suburb = create_test_suburb(db_session)
+    listing = create_test_listing(suburb.id, 2007, price="$1,000,000", beds=3, cardFingerprint=1)
+    property = property_import_service.create_property_with_relations(db_session, dict(listing))
+    assert property.fingerprint == 1
+
+    # Same fingerprint, the stored row is left alone
+    property = property_import_service.create_property_with_relations(db_session, {**listing, "price": "$900,000"})
+    assert property.display_price == "$1,000,000"
+
+    # Changed fingerprint, the row is updated in place
+    changed = {**listing, "price": "$950,000", "cardFingerprint": 2}
+    property = property_import_service.create_property_with_relations(db_session, changed)
+    assert property.display_price == "$950,000"
+    assert property.fingerprint == 2
+    assert db_session.query(Property).filter(Property.id == 2007).count() == 1
+
+
+def test_card_refresh_keeps_a_reseeded_index_up_to_date(db_session):
+    """After a search card refresh, an index seeded from the database holds the card's fingerprint"""
+    cleanup_database(db_session)
+
+    suburb = create_test_suburb(db_session)
+    listing = create_test_listing(suburb.id, 2301)
+    property_import_service.create_property_with_relations(db_session, {**listing, "cardFingerprint": 1})
+    db_session.commit()
+
+    card = {"listingId": 2301, "price": "$950k", "cardFingerprint": 2}
+    property_import_service.update_property_summaries(db_session, [card])
+    db_session.commit()
+
+    # What a --worker run starts from, the listing must not look changed against its card
+    seen_listings = SeenListingIndex()
+    seen_listings.seed_from_db(db_session)
+    assert seen_listings.fingerprint(2301) == 2
+
+    # A card without a fingerprint leaves the stored one alone
+    property_import_service.update_property_summaries(db_session, [{"listingId": 2301, "price": "$900k"}])
+    db_session.commit()
+    stored = db_session.query(Property.display_price, Property.fingerprint).filter(Property.id == 2301).one()
+    assert tuple(stored) == ("$900k", 2)
+
+
+def test_suburb_refreshed_when_insights_hash_changes(db_session):
+    """A known suburb is only rewritten when a listing brings a different insights hash"""
+    cleanup_database(db_session)
+
+    listing = {
+        "suburb": "Hash Suburb",
+        "postcode": "2999",
+        "state": "NSW",
+        "suburbInsights": {"suburbProfileUrl": "https://example.com/hash-suburb", "medianPrice": 1000000},
+        "suburbInsightsHash": 1,
+    }
+    cache = SuburbCache()
+    suburb_id = cache.resolve(db_session, listing)
+    db_session.commit()
+
+    def stored():
+        return tuple(db_session.query(Suburb.median_price, Suburb.insights_hash).filter(Suburb.id == suburb_id).one())
+
+    assert stored() == (1000000, 1)
+
+    # Same hash, the stored insights are kept even if the payload differs
+    stale = {**listing, "suburbInsights": {**listing["suburbInsights"], "medianPrice": 900000}}
+    assert cache.resolve(db_session, stale) == suburb_id
+    db_session.commit()
+    assert stored() == (1000000, 1)
+
+    # Changed hash, the suburb is refreshed in place
+    assert cache.resolve(db_session, {**stale, "suburbInsightsHash": 2}) == suburb_id
+    db_session.commit()
+    assert stored() == (900000, 2)
+    assert db_session.query(Suburb).filter_by(name="Hash Suburb", postcode="2999").count() == 1
+
+
+def test_bulk_import_matches_per_row_import(db_session):
+    """The bulk upsert path leaves the same properties, schools and links as the per-row path"""
+
+    schools = [{"id": 3001, "name": "Test Public School", "distance": 400.0}, {"id": 3002, "distance": 900.0}]
+
+    def listings(suburb_id):
+        first = create_test_listing(suburb_id, 2101)
+        second = create_test_listing(suburb_id, 2102)
+        return [
+            {**first, "price": "$1m", "cardFingerprint": 1, "schools": schools},
+            {**second, "beds": 2, "schools": schools[:1]},
+            # Same listing again with a changed card, applied as an update
+            {**first, "price": "$900k", "cardFingerprint": 2, "schools": schools[1:]},
+            # No card fingerprint, skipped
+            {**second, "beds": 5},
+        ]
+
+    def updates(suburb_id):
+        # A later chunk of already stored listings
+        return [
+            # New card, overwritten with its schools relinked
+            create_test_listing(suburb_id, 2101, price="$850k", cardFingerprint=3, schools=schools),
+            # Stored without a fingerprint, so any card counts as changed
+            create_test_listing(suburb_id, 2102, beds=3, cardFingerprint=7),
+            # Same card as just stored, skipped
+            create_test_listing(suburb_id, 2101, price="$1", cardFingerprint=3, schools=[]),
+        ]
+
+    def snapshot():
+        properties = db_session.query(
+            Property.id, Property.display_price, Property.bedrooms, Property.fingerprint, Property.listing_url
+        )
+        links = db_session.query(property_school.c.property_id, property_school.c.school_id, property_school.c.distance)
+        # Each run has its own test suburb, so the schools are compared by name
+        schools = db_session.query(School.id, School.name)
+        return sorted(properties.all()), sorted(links.all()), sorted(schools.all())
+
+    cleanup_database(db_session)
+    suburb = create_test_suburb(db_session)
+    for property_data in listings(suburb.id):
+        property_import_service.create_property_with_relations(db_session, property_data)
+    per_row_inserted = snapshot()
+    for property_data in updates(suburb.id):
+        property_import_service.create_property_with_relations(db_session, property_data)
+    per_row_updated = snapshot()
+
+    cleanup_database(db_session)
+    suburb = create_test_suburb(db_session)
+    written = property_import_service.bulk_import_properties(db_session, listings(suburb.id))
+    assert written == {2101, 2102}
+    assert snapshot() == per_row_inserted
+    written = property_import_service.bulk_import_properties(db_session, updates(suburb.id))
+    assert written == {2101, 2102}
+    assert snapshot() == per_row_updated
+
+    assert per_row_inserted[0] == [
+        (2101, "$900k", 0, 2, "https://example.com/2101"),
+        (2102, None, 2, None, "https://example.com/2102"),
+    ]
+    assert per_row_inserted[1] == [(2101, 3002, 900.0), (2102, 3001, 400.0)]
+    assert per_row_updated[0] == [
+        (2101, "$850k", 0, 3, "https://example.com/2101"),
+        (2102, None, 3, 7, "https://example.com/2102"),
+    ]
+    assert per_row_updated[1] == [(2101, 3001, 400.0), (2101, 3002, 900.0)]
+
+
+def test_copy_loader_stages_and_merges_listings(db_session):
+    """The COPY loader creates suburbs, properties, schools and links from raw listings"""
+    cleanup_database(db_session)
+
+    suburb = {
+        "suburb": "Copy Suburb",
+        "postcode": "2998",
+        "state": "NSW",
+        "suburbInsights": {"suburbProfileUrl": "https://example.com/copy-suburb", "salesGrowthList": [{"year": 2024}]},
+        "suburbInsightsHash": 1,
+        "features": [],
+        "structuredFeatures": [],
+    }
+    schools = [{"id": 3101, "name": "Copy Public School", "distance": 250.0}]
+    listings = [
+        {
+            **suburb,
+            "listingId": 2201,
+            "listingUrl": "https://example.com/2201",
+            "features": ["Pool"],
+            "schools": schools,
+        },
+        {**suburb, "listingId": 2202, "listingUrl": "https://example.com/2202", "price": "Auction\tSat"},
+        # Repeated listing, the last occurrence wins
+        {**suburb, "listingId": 2202, "listingUrl": "https://example.com/2202", "price": "$800k", "schools": schools},
+    ]
+
+    stats = property_copy_loader.load(db_session, iter(listings))
+    assert stats["listings"] == 3
+    assert stats["properties_written"] == 2
+
+    copied_suburb = db_session.query(Suburb).filter_by(name="Copy Suburb", postcode="2998").one()
+    assert copied_suburb.sales_growth == [{"year": 2024}]
+    properties = db_session.query(Property).order_by(Property.id).all()
+    assert [(p.id, p.display_price, p.suburb_id) for p in properties] == [
+        (2201, None, copied_suburb.id),
+        (2202, "$800k", copied_suburb.id),
+    ]
+    assert properties[0].features == ["Pool"]
+    links = db_session.query(property_school.c.property_id, property_school.c.school_id).order_by("property_id")
+    assert links.all() == [(2201, 3101), (2202, 3101)]
+
+
+def test_suburb_cache_resolves_without_queries_after_first_use(db_session):
+    """The cache preloads known suburbs, inserts missing ones once and forgets rolled back inserts"""
+    cleanup_database(db_session)
+
+    existing = create_test_suburb(db_session)
+    cache = SuburbCache()
+    listing = {
+        "suburb": "Cache Suburb",
+        "postcode": "2997",
+        "suburbInsights": {"suburbProfileUrl": "https://example.com/cache-suburb", "medianPrice": 1000000},
+        "suburbInsightsHash": 1,
+    }
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.lower())
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", record_statement)
+
+    known = {"suburb": "Test Suburb", "postcode": "2000", "suburbInsights": {"medianPrice": 1}}
+    assert cache.resolve(db_session, known) == existing.id
+    assert cache.stats["hits"] == 1
+
+    # Once loaded, a known suburb is resolved without touching the suburb table
+    statements.clear()
+    assert cache.resolve(db_session, known) == existing.id
+    assert not [statement for statement in statements if "suburb" in statement]
+
+    # An insert that is rolled back is never handed out again
+    cache.resolve(db_session, listing)
+    db_session.rollback()
+    assert db_session.query(Suburb).filter_by(name="Cache Suburb").count() == 0
+
+    suburb_id = cache.resolve(db_session, listing)
+    db_session.commit()
+    statements.clear()
+    assert cache.resolve(db_session, listing) == suburb_id
+    assert not [statement for statement in statements if "suburb" in statement]
+    assert cache.stats["inserted"] == 2
+
+    # A changed insights payload refreshes the suburb in place
+    changed = {**listing, "suburbInsights": {**listing["suburbInsights"], "medianPrice": 1200000}}
+    assert cache.resolve(db_session, {**changed, "suburbInsightsHash": 2}) == suburb_id
+    db_session.commit()
+    assert db_session.get(Suburb, suburb_id).median_price == 1200000
+    assert db_session.query(Suburb).filter_by(name="Cache Suburb").count() == 1
+    event.remove(db_session.get_bind(), "before_cursor_execute", record_statement)
+
+
+def test_suburb_cache_forgets_suburbs_of_a_rolled_back_chunk(db_session):
+    """A suburb inserted under a released savepoint isn't cached if the chunk then rolls back"""
+    cleanup_database(db_session)
+
+    cache = SuburbCache()
+    listing = {
+        "suburb": "Savepoint Suburb",
+        "postcode": "2996",
+        "suburbInsights": {"suburbProfileUrl": "https://example.com/savepoint-suburb", "medianPrice": 900000},
+        "suburbInsightsHash": 1,
+    }
+
+    # As in import_property_batch, the suburb is inserted in a savepoint that is released
+    with db_session.begin_nested():
+        cache.resolve(db_session, listing)
+    db_session.rollback()
+    assert len(cache) == 0
+
+    # The next chunk inserts the suburb again instead of linking to a rolled back id
+    suburb_id = cache.resolve(db_session, listing)
+    db_session.commit()
+    assert cache.stats["inserted"] == 2
+    assert db_session.get(Suburb, suburb_id) is not None
+
+
+def test_resolve_schools_inserts_only_missing_schools(db_session):
+    """A chunk's schools are looked up together and only the unknown ones are created"""
+    cleanup_database(db_session)
+
+    suburb = create_test_suburb(db_session)
+    db_session.add(School(id=1, name="Stored School", suburb_id=suburb.id))
+    db_session.commit()
+
+    listings = [
+        {
+            "listingId": 501,
+            "suburb_id": suburb.id,
+            "schools": [{"id": 1, "name": "Renamed School", "distance": 100}, {"id": 2, "name": "New School"}],
+        },
+        {"listingId": 502, "suburb_id": suburb.id, "schools": [{"id": 2, "name": "New School", "distance": 300}]},
+    ]
+    assert property_import_service.resolve_schools(db_session, listings) == {1, 2}
+    assert property_import_service.resolve_schools(db_session, listings) == {1, 2}
+    db_session.commit()
+
+    # Stored schools are left as they are, new ones created once
+    assert db_session.get(School, 1).name == "Stored School"
+    assert db_session.query(School).count() == 2
+
+    links = property_import_service.school_links(listings + listings)
+    assert sorted((link["property_id"], link["school_id"]) for link in links) == [(501, 1), (501, 2), (502, 2)]
+
+
+def test_failed_listing_rolls_back_only_itself(db_session):
+    """A listing that violates a constraint is discarded without undoing the rest of the batch"""
+    cleanup_database(db_session)
+
+    suburb = create_test_suburb(db_session)
+    first = create_test_listing(suburb.id, 2201)
+    second = create_test_listing(suburb.id, 2202)
+    # Same listing url as the first one, which must be unique
+    clash = create_test_listing(suburb.id, 2203, listingUrl="https://example.com/2201")
+
+    assert property_import_service.create_property_with_relations(db_session, first) is not None
+    assert property_import_service.create_property_with_relations(db_session, clash) is None
+    assert property_import_service.create_property_with_relations(db_session, second) is not None
+    db_session.commit()
+
+    assert sorted(property.id for property in db_session.query(Property)) == [2201, 2202]
+
+
+def test_import_batch_returns_the_listings_it_rejected(db_session, tmp_path):
+    """Listings that fail in a chunk are returned with the reason and written to the rejected file"""
+    cleanup_database(db_session)
+
+    suburb = {
+        "suburb": "Rejected Suburb",
+        "postcode": "2995",
+        "suburbInsights": {"suburbProfileUrl": "https://example.com/rejected-suburb"},
+        "suburbInsightsHash": 1,
+    }
+    first = {**create_test_listing(None, 2401), **suburb}
+    # Same listing url as the first one, the bulk write fails and the chunk is imported row by row
+    clash = {**create_test_listing(None, 2402, listingUrl="https://example.com/2401"), **suburb}
+    second = {**create_test_listing(None, 2403), **suburb}
+
+    rejected = RejectedListings(str(tmp_path / "rejected.jsonl"))
+    assert import_property_batch(db_session, {"properties": [first, clash, second]}, rejected) == {
+        2402: "Failed to create/get property"
+    }
+    rejected.close()
+
+    assert sorted(db_session.scalars(select(Property.id))) == [2401, 2403]
+    with open(tmp_path / "rejected.jsonl") as f:
+        assert [json.loads(line)["listingId"] for line in f] == [2402]
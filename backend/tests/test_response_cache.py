@@ -0,0 +1,73 @@
+import os
+import hashlib
+from httpx import Request, Response
+from scripts import response_cache
+from scripts.response_cache import ResponseCache
+
+
+def make_response(url: str, body: bytes, **headers) -> Response:
+    return Response(200, content=body, headers=headers, request=Request("GET", url))
+
+
+def fake_clock(monkeypatch):
+    """Strictly increasing fetch times, so the latest entry doesn't depend on timer resolution"""
+
+    ticks = iter(range(1, 1000))
+    monkeypatch.setattr(response_cache.time, "time", lambda: float(next(ticks)))
+
+
+def test_cache_miss_and_hit_with_validators(tmp_path, monkeypatch):
+    fake_clock(monkeypatch)
+    cache = ResponseCache(str(tmp_path))
+    url = "https://www.domain.com.au/listing-1"
+
+    assert cache.latest(url) is None
+    assert cache.validators(cache.latest(url)) == {}
+
+    cache.store(url, make_response(url, b"<html>v1</html>", etag='"v1"', **{"last-modified": "Mon, 01 Jan 2024"}))
+    entry = cache.latest(url)
+    assert entry["etag"] == '"v1"'
+    assert cache.validators(entry) == {"if-none-match": '"v1"', "if-modified-since": "Mon, 01 Jan 2024"}
+
+    # A 304 is answered from disk with the cached body
+    response = cache.revalidated(entry)
+    assert response.status_code == 200
+    assert response.content == b"<html>v1</html>"
+    cache.close()
+
+
+def test_bodies_are_keyed_by_content(tmp_path, monkeypatch):
+    fake_clock(monkeypatch)
+    cache = ResponseCache(str(tmp_path))
+    body = b"<html>same page</html>"
+
+    first = cache.store("https://www.domain.com.au/a", make_response("https://www.domain.com.au/a", body))
+    second = cache.store("https://www.domain.com.au/b", make_response("https://www.domain.com.au/b", body))
+    assert first == second == hashlib.sha256(body).hexdigest()
+    assert os.listdir(os.path.join(str(tmp_path), "objects")) == [f"{first}.gz"]
+
+    # The newest fetch of a url wins
+    cache.store("https://www.domain.com.au/a", make_response("https://www.domain.com.au/a", b"<html>new</html>"))
+    assert cache.latest("https://www.domain.com.au/a")["digest"] == hashlib.sha256(b"<html>new</html>").hexdigest()
+    cache.close()
+
+    # Reopening the directory finds the same entries
+    reopened = ResponseCache(str(tmp_path))
+    assert reopened.latest("https://www.domain.com.au/b")["digest"] == first
+    reopened.close()
+
+
+def test_replay_skips_entries_whose_body_is_missing(tmp_path, monkeypatch):
+    fake_clock(monkeypatch)
+    cache = ResponseCache(str(tmp_path))
+    for name in ("a", "b", "c"):
+        url = f"https://www.domain.com.au/{name}"
+        cache.store(url, make_response(url, f"<html>{name}</html>".encode()))
+
+    os.remove(os.path.join(str(tmp_path), "objects", f"{cache.latest('https://www.domain.com.au/b')['digest']}.gz"))
+
+    assert list(cache.iter_latest()) == [
+        ("https://www.domain.com.au/a", b"<html>a</html>"),
+        ("https://www.domain.com.au/c", b"<html>c</html>"),
+    ]
+    cache.close()
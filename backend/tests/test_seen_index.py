@@ -0,0 +1,39 @@
+import os
+from scripts.seen_index import SeenListingIndex
+
+
+def test_seen_index_save_load_round_trip(tmp_path):
+    """Ids and card fingerprints survive the compact on-disk form, including later fingerprint updates"""
+    path = str(tmp_path / "seen_index.bin")
+
+    index = SeenListingIndex(path)
+    index.update(["2019000001", 2019000002])
+    index.update_fingerprints({2019000003: -(2**63), 2019000004: 2**63 - 1})
+    index.save()
+
+    # 8 bytes per id, 16 per (id, fingerprint) pair
+    assert os.path.getsize(path) == 4 * 8
+    assert os.path.getsize(f"{path}.fingerprints") == 2 * 16
+
+    loaded = SeenListingIndex(path)
+    assert loaded.load() == 4
+    assert "2019000001" in loaded and 2019000004 in loaded
+    assert loaded.fingerprint(2019000001) is None
+    assert loaded.fingerprint("2019000003") == -(2**63)
+
+    # A changed card replaces the stored fingerprint on the next save
+    loaded.update_fingerprints({2019000003: 42, 2019000001: 7})
+    loaded.save()
+
+    reloaded = SeenListingIndex(path)
+    reloaded.load()
+    assert len(reloaded) == 4
+    fingerprints = [reloaded.fingerprint(listing_id) for listing_id in range(2019000001, 2019000005)]
+    assert fingerprints == [7, None, 42, 2**63 - 1]
+
+
+def test_seen_index_without_a_file(tmp_path):
+    index = SeenListingIndex(str(tmp_path / "missing.bin"))
+    assert index.load() == 0
+    assert len(index) == 0
+    assert SeenListingIndex().load() == 0